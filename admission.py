@@ -0,0 +1,241 @@
+"""
+Admission control in front of expensive work
+One client hammering /api/extract with unique URLs used to be able to tie up
+every worker with 30 s yt-dlp runs. Two limits now sit in front of cache
+misses (cache hits never reach them, so they stay fast under overload):
+
+- ConcurrencyLimiter: at most `limit` extractions (or proxy streams) at once
+  per process, with a bounded queue of waiters; past that, requests are
+  rejected at once with 503 instead of piling up.
+- RateLimiter: a token bucket per client IP (`per_minute` refill, `burst`
+  capacity); an empty bucket is a 429 with Retry-After. Buckets live in
+  process memory, or in SQLite so all workers on a node share one budget.
+"""
+import math
+import os
+import sqlite3
+import tempfile
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from threading import Condition, Lock
+
+from sqlite_local import LocalConnection
+
+
+class Rejected(Exception):
+    """Raised instead of starting work the server has no room for"""
+
+    def __init__(self, status, message, retry_after=1):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class ConcurrencyLimiter:
+    """Counting semaphore with a bounded, time-limited wait queue"""
+
+    def __init__(self, limit, max_waiting=0, timeout=10.0, name='work'):
+        # limit <= 0 disables the limiter
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.name = name
+        self._cond = Condition(Lock())
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def _has_room(self):
+        return self.limit <= 0 or self.active < self.limit
+
+    def acquire(self):
+        """Take a slot, waiting up to `timeout`; raises Rejected (503) if there is none"""
+        with self._cond:
+            if not self._has_room():
+                if self.waiting >= self.max_waiting:
+                    self.rejected += 1
+                    raise Rejected(503, f'Server is busy ({self.name}). Please try again shortly.')
+                self.waiting += 1
+                try:
+                    admitted = self._cond.wait_for(self._has_room, timeout=self.timeout)
+                finally:
+                    self.waiting -= 1
+                if not admitted:
+                    self.rejected += 1
+                    raise Rejected(503, f'Server is busy ({self.name}). Please try again shortly.', self.timeout)
+            self.active += 1
+            self.admitted += 1
+
+    def try_acquire(self, force=False):
+        """
+        Take a slot only if one is free, without waiting
+        force takes one regardless, to hand over a slot its caller is about to release
+        """
+        with self._cond:
+            # Never ahead of requests waiting in acquire()
+            if not force and (self.waiting or not self._has_room()):
+                return False
+            self.active += 1
+            return True
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'limit': self.limit,
+                'active': self.active,
+                'waiting': self.waiting,
+                'max_waiting': self.max_waiting,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+            }
+
+
+def _refill(tokens, updated, now, rate, burst, cost=1):
+    """Token bucket step: (allowed, tokens left, seconds until `cost` tokens are there)"""
+    tokens = min(burst, tokens + (now - updated) * rate)
+    if tokens >= cost:
+        return True, tokens - cost, 0.0
+    return False, tokens, (cost - tokens) / rate
+
+
+class MemoryBucketStore:
+    """Per-process token buckets; the least recently seen clients are dropped first"""
+
+    def __init__(self, max_clients=10000):
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()  # client -> (tokens, updated)
+        self._lock = Lock()
+
+    def take(self, client, rate, burst, cost=1):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (burst, now))
+            allowed, tokens, retry_after = _refill(tokens, updated, now, rate, burst, cost)
+            self._buckets[client] = (tokens, now)
+            # A dropped client just starts again with a full bucket
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+    def stats(self):
+        with self._lock:
+            return {'backend': 'memory', 'clients': len(self._buckets)}
+
+
+class SQLiteBucketStore:
+    """
+    Token buckets shared by all worker processes through a SQLite file, so a
+    client gets one budget per node rather than one per worker
+    """
+
+    def __init__(self, path=None, idle_after=3600, purge_every=500):
+        self.path = path or os.path.join(tempfile.gettempdir(), 'linkedin_video_ratelimit.sqlite3')
+        self.idle_after = idle_after
+        self.purge_every = purge_every
+        self._db = LocalConnection(self.path, (
+            'CREATE TABLE IF NOT EXISTS rate_limits ('
+            'client TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)'
+        ))
+        self._writes = 0
+        self.errors = 0
+
+    def take(self, client, rate, burst, cost=1):
+        now = time.time()
+        try:
+            conn = self._db.get()
+            # Read and update in one write transaction so workers can't both spend a token
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute(
+                    'SELECT tokens, updated FROM rate_limits WHERE client = ?', (client,)
+                ).fetchone()
+                tokens, updated = row if row else (burst, now)
+                allowed, tokens, retry_after = _refill(tokens, updated, now, rate, burst, cost)
+                conn.execute(
+                    'INSERT OR REPLACE INTO rate_limits (client, tokens, updated) VALUES (?, ?, ?)',
+                    (client, tokens, now)
+                )
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            self._writes += 1
+            if self._writes % self.purge_every == 0:
+                conn.execute('DELETE FROM rate_limits WHERE updated < ?', (now - self.idle_after,))
+        except sqlite3.Error:
+            # Fail open: a broken limiter shouldn't take the service down
+            self.errors += 1
+            return True, 0.0
+        return allowed, retry_after
+
+    def stats(self):
+        try:
+            clients = self._db.get().execute('SELECT COUNT(*) FROM rate_limits').fetchone()[0]
+        except sqlite3.Error:
+            clients = None
+        return {'backend': 'sqlite', 'path': self.path, 'clients': clients, 'errors': self.errors}
+
+
+class RateLimiter:
+    """Per-client token bucket: `burst` requests at once, refilled at `per_minute`"""
+
+    def __init__(self, per_minute, burst=None, store=None):
+        # per_minute <= 0 disables the limiter
+        self.per_minute = per_minute
+        self.burst = max(1, burst or per_minute)
+        self.store = store or MemoryBucketStore()
+        self.allowed = 0
+        self.limited = 0
+
+    @property
+    def enabled(self):
+        return self.per_minute > 0
+
+    def check(self, client, cost=1):
+        """
+        Spend `cost` of `client`'s tokens, all or none; raises Rejected (429)
+        if it doesn't have that many
+        """
+        if not self.enabled or client is None or cost <= 0:
+            return
+        if cost > self.burst:
+            # The bucket never holds that many: waiting wouldn't help
+            self.limited += 1
+            raise Rejected(429, f'Too many new extractions at once: at most {self.burst} per request.', 60)
+        allowed, retry_after = self.store.take(client, self.per_minute / 60.0, self.burst, cost)
+        if not allowed:
+            self.limited += 1
+            raise Rejected(429, 'Too many requests. Please slow down and try again shortly.', retry_after)
+        self.allowed += 1
+
+    def stats(self):
+        return {
+            'per_minute': self.per_minute,
+            'burst': self.burst,
+            'allowed': self.allowed,
+            'limited': self.limited,
+            'store': self.store.stats(),
+        }
+
+
+def create_rate_limiter(per_minute, burst=None, backend='memory', path=None):
+    """RateLimiter with a 'memory' (per process) or 'sqlite' (per node) store"""
+    if backend == 'sqlite':
+        return RateLimiter(per_minute, burst, SQLiteBucketStore(path))
+    return RateLimiter(per_minute, burst, MemoryBucketStore())
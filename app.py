@@ -2,17 +2,39 @@
 LOCAL DEVELOPMENT ONLY - DO NOT USE ON VERCEL
 This file is for local development. Vercel uses app_vercel.py via api/index.py
 """
-from flask import Flask, render_template, request, jsonify, send_file, Response
+from flask import Flask, render_template, request, jsonify, send_file, Response, g, has_request_context, url_for
 import subprocess
 import json
 import os
 import re
 import requests
-import time
 import hashlib
+import hmac
+import queue
+import time
+import uuid
 from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from functools import lru_cache
 from threading import Lock
+from werkzeug.middleware.proxy_fix import ProxyFix
+from admission import ConcurrencyLimiter, Rejected, create_rate_limiter
+from disk_cache import VIDEO_EXTS, DiskCache
+from formats import BEST, FORMAT_FIELDS, select_format
+from metadata_cache import INFO_FIELDS, NegativeCache, VideoInfo, create_cache
+from page_extract import PageExtractor
+from prefetch import Prefetcher, create_pins
+from scheduler import BackgroundScheduler
+from http_pool import connection_stats, get_session
+from linkedin_url import CanonicalStats, canonicalize, extraction_url, find_urn
+from jobs import FAILED, BatchJob, JobQueue, QueueFull
+from metrics import Registry
+from singleflight import SingleFlight
+from size_probe import SizeProber
+from strategy import StrategyRacer, classify_error
+from thumbnails import ThumbnailCache
+from streaming import LocalCopies, iter_upstream, metered, proxy_headers, upstream_headers
+from ytdlp_pool import YoutubeDLPool, YT_DLP_AVAILABLE, yt_dlp
 
 app = Flask(__name__)
 
@@ -50,44 +72,162 @@ def get_download_dir():
     
     return DOWNLOAD_DIR
 
+# Prometheus metrics (GET /metrics). Children used on hot paths are bound
+# once here so recording is just an increment
+metrics = Registry('linkedin_video')
+STAGE_SECONDS = metrics.histogram('stage_seconds', 'Time spent in each extraction stage', ['stage'])
+CACHE_LOOKUP_TIME = STAGE_SECONDS.labels('cache_lookup')
+FAST_PATH_TIME = STAGE_SECONDS.labels('fast_path')
+EXTRACT_TIME = STAGE_SECONDS.labels('extract')
+JSON_PARSE_TIME = STAGE_SECONDS.labels('json_parse')
+SIZE_PROBE_TIME = STAGE_SECONDS.labels('size_probe')
+ATTEMPT_SECONDS = metrics.histogram('extract_attempt_seconds', 'Duration of one yt-dlp method attempt', ['method'])
+ATTEMPTS = metrics.counter('extract_attempts_total', 'yt-dlp method attempts by result (success or error class)', ['method', 'result'])
+REQUEST_SECONDS = metrics.histogram('request_seconds', 'Time to produce a response, by endpoint', ['endpoint'])
+PROXY_BYTES = metrics.counter('proxy_bytes_total', 'Bytes sent by /api/download-proxy', ['source'])
+PROXY_UPSTREAM_BYTES = PROXY_BYTES.labels('upstream')
+PROXY_DISK_BYTES = PROXY_BYTES.labels('disk')
+PROXY_STREAMS = metrics.gauge('proxy_active_streams', 'Upstream streams open in /api/download-proxy')
+
 # Cache configuration
 CACHE_TTL = 3600  # 1 hour
-cache = {}
-cache_lock = Lock()
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 1024))
+CACHE_MAX_BYTES = int(os.getenv('CACHE_MAX_BYTES', 16 * 1024 * 1024))
+# 'sqlite' shares the cache between gunicorn workers and across restarts
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'sqlite')
+CACHE_DB_PATH = os.getenv('CACHE_DB_PATH')
+cache = create_cache(
+    CACHE_BACKEND,
+    ttl=CACHE_TTL,
+    max_entries=CACHE_MAX_ENTRIES,
+    max_bytes=CACHE_MAX_BYTES,
+    path=CACHE_DB_PATH
+)
 
-# Cleanup old files (older than 1 hour)
-CLEANUP_INTERVAL = 3600
-last_cleanup = time.time()
+# Concurrent extractions of the same URL share one yt-dlp run
+extract_flight = SingleFlight()
 
-def cleanup_old_files():
-    """Remove files older than 1 hour"""
-    global last_cleanup
-    current_time = time.time()
-    
-    if current_time - last_cleanup < CLEANUP_INTERVAL:
-        return
-    
-    download_dir = get_download_dir()
-    
-    # Skip cleanup on Vercel (read-only filesystem)
-    if not os.access(download_dir, os.W_OK):
-        return
-    
-    try:
-        if os.path.exists(download_dir) and os.path.isdir(download_dir):
-            for filename in os.listdir(download_dir):
-                filepath = os.path.join(download_dir, filename)
-            if os.path.isfile(filepath):
-                file_age = current_time - os.path.getmtime(filepath)
-                if file_age > CLEANUP_INTERVAL:
-                    os.remove(filepath)
-        last_cleanup = current_time
-    except Exception as e:
-        print(f"Cleanup error: {e}")
+# Cache hit counters for canonical (URN-based) keys
+url_stats = CanonicalStats()
+
+# Public posts are parsed straight from the page HTML; yt-dlp only runs when
+# that fails (private posts, layout changes)
+FAST_EXTRACT = os.getenv('FAST_EXTRACT', 'true').lower() == 'true'
+page_extractor = PageExtractor()
+
+# Failed extractions are remembered for an error-class-specific TTL, so
+# retries of a private or deleted video don't re-run every method
+NEGATIVE_CACHE = os.getenv('NEGATIVE_CACHE', 'true').lower() == 'true'
+negative_cache = NegativeCache(cache, enabled=NEGATIVE_CACHE)
+
+# HEAD requests for Content-Length run in the background; set SIZE_PROBE_WAIT
+# to wait briefly for them during extraction
+SIZE_PROBE_WAIT = float(os.getenv('SIZE_PROBE_WAIT', 0))
+size_prober = SizeProber(timer=SIZE_PROBE_TIME)
+
+# Videos fetched by /api/download, served by the proxy without the CDN
+local_copies = LocalCopies()
+
+# Cache misses from /api/extract/batch run on a bounded pool shared by all batches
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', 4))
+BATCH_MAX_URLS = int(os.getenv('BATCH_MAX_URLS', 500))
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix='batch')
+# A streamed batch holds its gunicorn worker until the last line, and the
+# arbiter kills it after --timeout (120 s). Each wave of BATCH_WORKERS misses
+# can take ~40 s (hedged 30 s attempts plus the slot wait), so bigger batches
+# run as background jobs instead (at most BATCH_MAX_QUEUED waiting)
+BATCH_STREAM_MAX_URLS = int(os.getenv('BATCH_STREAM_MAX_URLS', 2 * BATCH_WORKERS))
+BATCH_MAX_QUEUED = int(os.getenv('BATCH_MAX_QUEUED', 20))
+
+# Admission control for expensive work (cache hits skip it, see admission.py):
+# at most EXTRACT_CONCURRENCY extractions per worker, with EXTRACT_MAX_WAITING
+# more queued for up to EXTRACT_QUEUE_TIMEOUT seconds before a 503
+EXTRACT_CONCURRENCY = int(os.getenv('EXTRACT_CONCURRENCY', 8))
+EXTRACT_MAX_WAITING = int(os.getenv('EXTRACT_MAX_WAITING', 32))
+EXTRACT_QUEUE_TIMEOUT = float(os.getenv('EXTRACT_QUEUE_TIMEOUT', 10))
+extract_limiter = ConcurrencyLimiter(
+    EXTRACT_CONCURRENCY,
+    max_waiting=EXTRACT_MAX_WAITING,
+    timeout=EXTRACT_QUEUE_TIMEOUT,
+    name='extractions'
+)
+
+# Upstream streams in /api/download-proxy each hold a worker thread until the
+# client has the whole file; past PROXY_MAX_STREAMS new ones get a 503
+PROXY_MAX_STREAMS = int(os.getenv('PROXY_MAX_STREAMS', 64))
+stream_limiter = ConcurrencyLimiter(PROXY_MAX_STREAMS, name='downloads')
+
+# Cache misses and new downloads per client IP (token bucket, 0 disables);
+# 'sqlite' shares each client's budget between gunicorn workers
+RATE_LIMIT_PER_MINUTE = int(os.getenv('RATE_LIMIT_PER_MINUTE', 30))
+RATE_LIMIT_BURST = int(os.getenv('RATE_LIMIT_BURST', 10))
+RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory')
+rate_limiter = create_rate_limiter(
+    RATE_LIMIT_PER_MINUTE,
+    RATE_LIMIT_BURST,
+    backend=RATE_LIMIT_BACKEND,
+    path=os.getenv('RATE_LIMIT_DB_PATH')
+)
+
+# Behind a load balancer every request comes from its address; trust this
+# many X-Forwarded-For hops to find the client's
+TRUSTED_PROXIES = int(os.getenv('TRUSTED_PROXIES', 0))
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
+
+# Downloaded videos, keyed by URL hash and evicted LRU past the byte budget,
+# after VIDEO_CACHE_MAX_AGE without access, or when the disk is nearly full
+VIDEO_CACHE_MAX_BYTES = int(os.getenv('VIDEO_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+VIDEO_CACHE_MAX_AGE = int(os.getenv('VIDEO_CACHE_MAX_AGE', 3600))
+DISK_HIGH_WATER = float(os.getenv('DISK_HIGH_WATER', 0.90))
+video_cache = None
+
+def get_video_cache():
+    """Lazy initialization of the on-disk video cache"""
+    global video_cache
+    if video_cache is None:
+        video_cache = DiskCache(
+            os.path.join(get_download_dir(), 'cache'),
+            max_bytes=VIDEO_CACHE_MAX_BYTES,
+            max_age=VIDEO_CACHE_MAX_AGE,
+            high_water=DISK_HIGH_WATER,
+            low_water=DISK_HIGH_WATER - 0.10
+        )
+    return video_cache
+
+# Thumbnails proxied by /api/thumbnail: originals and resized variants,
+# keyed by video ID, in memory and on disk
+THUMBNAIL_CACHE_MAX_BYTES = int(os.getenv('THUMBNAIL_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+THUMBNAIL_QUALITY = int(os.getenv('THUMBNAIL_QUALITY', 80))
+THUMBNAIL_WIDTH = int(os.getenv('THUMBNAIL_WIDTH', 640))
+# Browser/CDN cache lifetime; after it, the ETag makes revalidation a 304
+THUMBNAIL_MAX_AGE = int(os.getenv('THUMBNAIL_MAX_AGE', 86400))
+thumbnails = None
+
+def get_thumbnails():
+    """Lazy initialization of the thumbnail cache"""
+    global thumbnails
+    if thumbnails is None:
+        thumbnails = ThumbnailCache(
+            os.path.join(get_download_dir(), 'thumbnails'),
+            quality=THUMBNAIL_QUALITY,
+            max_bytes=THUMBNAIL_CACHE_MAX_BYTES
+        )
+    return thumbnails
+
+# Cache eviction runs in the background, never on a user request
+CLEANUP_INTERVAL = int(os.getenv('CLEANUP_INTERVAL', 300))
+
+def _maintain_video_cache():
+    get_video_cache().maintain()
+    get_thumbnails().maintain()
+    _prune_batch_results()
+
+cleanup_scheduler = BackgroundScheduler(CLEANUP_INTERVAL, _maintain_video_cache, name='video-cache-cleanup')
 
 def get_cache_key(url):
-    """Generate cache key from URL"""
-    return hashlib.md5(url.encode()).hexdigest()
+    """Generate cache key from the canonical form of a URL (see linkedin_url)"""
+    return hashlib.md5(canonicalize(url).encode()).hexdigest()
 
 def sanitize_filename(filename):
     """Remove invalid characters from filename"""
@@ -117,121 +257,336 @@ def _format_linkedin_error(error_msg, url):
     else:
         return error_msg
 
-def get_video_info_optimized(url):
+# Extraction methods, tried in order until one succeeds
+EXTRACT_METHODS = [
+    # Method 1: Standard extraction
+    {'format': 'best[ext=mp4]/best'},
+    # Method 2: Try without format restriction
+    {'format': None},
+    # Method 3: Try with best format only
+    {'format': 'best'},
+]
+
+EXTRACT_TIMEOUT = 30
+
+# Warm YoutubeDL pool (one per method, since options differ)
+# Each instance serves one extraction at a time
+# At least EXTRACT_CONCURRENCY, or admitted extractions would hold a limiter
+# slot while they queue for an instance
+YTDL_POOL_SIZE = int(os.getenv('YTDL_POOL_SIZE', max(4, EXTRACT_CONCURRENCY)))
+ydl_pools = {}
+ydl_pools_lock = Lock()
+
+def get_ydl_pool(method):
+    """Get (or lazily create) the YoutubeDL pool for an extraction method"""
+    key = method['format']
+    with ydl_pools_lock:
+        pool = ydl_pools.get(key)
+        if pool is None:
+            opts = {
+                'quiet': True,
+                'no_warnings': True,
+                'extract_flat': False,
+                'socket_timeout': EXTRACT_TIMEOUT,
+            }
+            if method['format']:
+                opts['format'] = method['format']
+            pool = YoutubeDLPool(opts, size=YTDL_POOL_SIZE)
+            ydl_pools[key] = pool
+        return pool
+
+# Pre-initialize the primary method's pool so the first request is fast
+if YT_DLP_AVAILABLE:
+    get_ydl_pool(EXTRACT_METHODS[0]).warm(1)
+
+def _format_extract_error(error_msg, url):
+    """Map raw yt-dlp error output to the message shown to users"""
+    if "Unable to extract video" in error_msg or "Private video" in error_msg:
+        return _format_linkedin_error(error_msg, url)
+    return error_msg
+
+def _extract_in_process(url, method, cancel=None):
+    """Run one extraction method on a pooled YoutubeDL instance"""
+    # A running extract_info can't be interrupted, but don't start a lost race
+    if cancel is not None and cancel.is_set():
+        return None, "Cancelled"
+    try:
+        info = get_ydl_pool(method).extract_info(url, timeout=EXTRACT_TIMEOUT)
+    except queue.Empty:
+        return None, "Server is busy. Please try again."
+    except Exception as e:
+        return None, str(e).strip()
+    if not info:
+        return None, "Failed to parse video information."
+    return info, None
+
+# yt-dlp prints only the fields VideoInfo.from_info reads, one JSON document
+# per line. --dump-json printed the whole info dict (every format's HTTP
+# headers, thumbnails, subtitles...) for json.loads to build in full and the
+# projection to throw away
+PRINT_TEMPLATES = (
+    '%(.{' + ','.join(INFO_FIELDS) + '}|null)j',
+    '%(formats.:.{' + ','.join(FORMAT_FIELDS) + '}|null)j',
+)
+
+def parse_printed_info(stdout):
+    """Rebuild the projected info dict from the PRINT_TEMPLATES output"""
+    lines = stdout.strip().splitlines()[-len(PRINT_TEMPLATES):]
+    if len(lines) < len(PRINT_TEMPLATES):
+        raise ValueError('incomplete yt-dlp output')
+    info = json.loads(lines[0]) or {}
+    info['formats'] = json.loads(lines[1]) or []
+    return info
+
+def _extract_subprocess(url, method, cancel=None):
+    """Run one extraction method through the yt-dlp command line tool"""
+    cmd = ['yt-dlp']
+    if method['format']:
+        cmd += ['--format', method['format']]
+    for template in PRINT_TEMPLATES:
+        cmd += ['--print', template]
+    cmd += ['--no-warnings', url]
+    
+    try:
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True
+        )
+    except Exception as e:
+        return None, str(e)
+    
+    # Poll so a lost race (or the timeout) can kill the process
+    deadline = time.monotonic() + EXTRACT_TIMEOUT
+    while True:
+        try:
+            stdout, stderr = proc.communicate(timeout=0.25)
+            break
+        except subprocess.TimeoutExpired:
+            cancelled = cancel is not None and cancel.is_set()
+            if cancelled or time.monotonic() > deadline:
+                proc.kill()
+                proc.communicate()
+                if cancelled:
+                    return None, "Cancelled"
+                return None, "Request timed out. Please try again."
+    
+    if proc.returncode != 0:
+        return None, stderr.strip()
+    
+    start = time.perf_counter()
+    try:
+        return parse_printed_info(stdout), None
+    except (ValueError, TypeError):
+        return None, "Failed to parse video information."
+    finally:
+        JSON_PARSE_TIME.observe(time.perf_counter() - start)
+
+def _run_extract_method(url, method, cancel=None):
+    """
+    Run one extraction method, returning (info, error) with yt-dlp's own
+    error message (classified, then formatted for users by _extract_and_cache)
+    Uses the in-process yt-dlp API when available and falls back to the CLI
+    (e.g. when yt-dlp was installed with brew rather than pip)
+    """
+    start = time.perf_counter()
+    if YT_DLP_AVAILABLE:
+        info, error = _extract_in_process(url, method, cancel)
+    else:
+        info, error = _extract_subprocess(url, method, cancel)
+    
+    label = method['format'] or 'default'
+    ATTEMPT_SECONDS.labels(label).observe(time.perf_counter() - start)
+    if info and not error:
+        result = 'success'
+    else:
+        result = 'cancelled' if error == "Cancelled" else classify_error(error)
+    ATTEMPTS.labels(label, result).inc()
+    return info, error
+
+# How the methods are combined: 'hedged' starts the next method when the
+# current one is slower than EXTRACT_HEDGE_DELAY (or failed), 'race' runs all
+# at once, 'sequential' only moves on after a failure
+EXTRACT_STRATEGY = os.getenv('EXTRACT_STRATEGY', 'hedged')
+EXTRACT_HEDGE_DELAY = float(os.getenv('EXTRACT_HEDGE_DELAY', 3.0))
+# Every attempt, hedges and cancelled losers still running included, holds an
+# extract_limiter slot, so EXTRACT_CONCURRENCY bounds yt-dlp runs and the
+# executor always has a thread for a new extraction's first attempt
+extract_racer = StrategyRacer(
+    EXTRACT_METHODS,
+    _run_extract_method,
+    mode=EXTRACT_STRATEGY,
+    hedge_delay=EXTRACT_HEDGE_DELAY,
+    max_workers=EXTRACT_CONCURRENCY * len(EXTRACT_METHODS) if EXTRACT_CONCURRENCY > 0 else 16,
+    limiter=extract_limiter,
+    # Each attempt is bounded by EXTRACT_TIMEOUT, but relaunches and hedges
+    # run back to back; cap the whole race at one timeout per method
+    max_time=EXTRACT_TIMEOUT * len(EXTRACT_METHODS)
+)
+
+def _charge_client(client):
+    """
+    Spend one of `client`'s rate limit tokens, at most once per request, so
+    an endpoint that both extracts and starts a download is charged once
+    """
+    if client is None:
+        return
+    if has_request_context():
+        if g.get('rate_limit_charged'):
+            return
+        rate_limiter.check(client)
+        g.rate_limit_charged = True
+    else:
+        rate_limiter.check(client)
+
+def get_video_info_optimized(url, retry=False, client=None):
     """
-    OPTIMIZED: Single yt-dlp call to get all info at once
-    This replaces 3-4 separate calls
+    OPTIMIZED: Single in-process yt-dlp call to get all info at once
+    Reuses warm YoutubeDL instances instead of spawning a process per method
+    retry=True ignores a cached failure and extracts again
+    client (an IP) is charged a cache miss against its rate limit; raises
+    Rejected when it is over it or no extraction slot frees up in time
     """
     cache_key = get_cache_key(url)
     
-    # Check cache
-    with cache_lock:
-        if cache_key in cache:
-            cached_data, cached_time = cache[cache_key]
-            if time.time() - cached_time < CACHE_TTL:
-                return cached_data, None
-    
-    # Try multiple extraction methods
-    methods = [
-        # Method 1: Standard extraction
-        {
-            'cmd': [
-                'yt-dlp',
-                '--format', 'best[ext=mp4]/best',
-                '--dump-json',
-                '--no-warnings',
-                url
-            ]
-        },
-        # Method 2: Try without format restriction
-        {
-            'cmd': [
-                'yt-dlp',
-                '--dump-json',
-                '--no-warnings',
-                url
-            ]
-        },
-        # Method 3: Try with best format only
-        {
-            'cmd': [
-                'yt-dlp',
-                '--format', 'best',
-                '--dump-json',
-                '--no-warnings',
-                url
-            ]
-        }
-    ]
+    start = time.perf_counter()
+    cached_data = cache.get(cache_key)
+    CACHE_LOOKUP_TIME.observe(time.perf_counter() - start)
+    url_stats.record(url, canonicalize(url), hit=cached_data is not None)
+    if cached_data is not None:
+        # About to expire: re-extract in the background so it never goes cold
+        prefetcher.touch(url, cache_key)
+        return cached_data, None
     
-    last_error = None
+    # Failed recently: return the same error without running yt-dlp again
+    if not retry:
+        failure = negative_cache.get(cache_key)
+        if failure is not None:
+            return None, failure.error
     
-    for method_idx, method in enumerate(methods):
-        try:
-            result = subprocess.run(
-                method['cmd'],
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            
-            if result.returncode == 0:
-                try:
-                    info = json.loads(result.stdout)
-                    
-                    # Extract video URL from info
-                    video_url = info.get('url')
-                    if not video_url and 'formats' in info and len(info['formats']) > 0:
-                        # Try to get URL from formats array
-                        video_url = info['formats'][0].get('url')
-                    
-                    # Get size from HTTP headers (async, non-blocking)
-                    size = 0
-                    if video_url:
-                        try:
-                            headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-                            response = requests.head(video_url, headers=headers, timeout=5, allow_redirects=True)
-                            content_length = response.headers.get('Content-Length')
-                            if content_length:
-                                size = int(content_length)
-                        except:
-                            pass
-                    
-                    # Prepare response data
-                    response_data = {
-                        'info': info,
-                        'video_url': video_url,
-                        'size': size,
-                        'duration': info.get('duration', 0)
-                    }
-                    
-                    # Cache the result
-                    with cache_lock:
-                        cache[cache_key] = (response_data, time.time())
-                    
-                    return response_data, None
-                    
-                except json.JSONDecodeError:
-                    last_error = "Failed to parse video information."
-                    continue
-            else:
-                # Store error but try next method
-                error_msg = result.stderr.strip()
-                if "Unable to extract video" in error_msg or "Private video" in error_msg:
-                    last_error = _format_linkedin_error(error_msg, url)
-                else:
-                    last_error = error_msg
-                continue
-                
-        except subprocess.TimeoutExpired:
-            last_error = "Request timed out. Please try again."
-            continue
-        except Exception as e:
-            last_error = str(e)
-            continue
+    _charge_client(client)
+    
+    # Only one extraction per URL at a time; concurrent callers share its result
+    start = time.perf_counter()
+    try:
+        return extract_flight.do(cache_key, _extract_video_info, url, cache_key)
+    finally:
+        EXTRACT_TIME.observe(time.perf_counter() - start)
+
+def _extract_video_info(url, cache_key):
+    """Wait for an extraction slot, then extract (flight leaders only)"""
+    # A previous flight may have finished between our cache check and now
+    cached_data = cache.get(cache_key, count=False)
+    if cached_data is not None:
+        return cached_data, None
+    
+    with extract_limiter.slot():
+        return _extract_and_cache(url, cache_key)
+
+def _extract_and_cache(url, cache_key):
+    """Run the extraction strategies and cache the first success"""
+    target_url = extraction_url(url)
+    info, error = None, None
+    if FAST_EXTRACT and find_urn(url):
+        start = time.perf_counter()
+        info = page_extractor.extract(target_url)
+        FAST_PATH_TIME.observe(time.perf_counter() - start)
+    
+    if info is None:
+        # First yt-dlp method to succeed wins; the others are cancelled
+        info, error = extract_racer.extract(target_url)
+    if info:
+        # Extract video URL from info
+        video_url = info.get('url')
+        if not video_url and 'formats' in info and len(info['formats']) > 0:
+            # Try to get URL from formats array
+            video_url = info['formats'][0].get('url')
+        
+        # Prefer the size yt-dlp reported; otherwise probe it in the background
+        size = info.get('filesize') or info.get('filesize_approx') or 0
+        if not size and video_url:
+            size = size_prober.resolve(video_url, wait=SIZE_PROBE_WAIT) or 0
+        
+        # Keep only the fields the API serves, not the full info dict
+        response_data = VideoInfo.from_info(info, video_url, size)
+        
+        # Cache the result
+        cache.set(cache_key, response_data)
+        
+        return response_data, None
+    
+    # All methods failed: classify yt-dlp's error, not the message shown to users
+    error_class = classify_error(error)
+    if error:
+        error = _format_extract_error(error, url)
+    else:
+        error = "Failed to extract video. The video may be private or require authentication."
+    negative_cache.set(cache_key, error, error_class)
+    return None, error
+
+def _refresh_video_info(url, force=False):
+    """Re-extract `url` into the cache (prefetch and refresh-ahead); returns an error or None"""
+    cache_key = get_cache_key(url)
+    # Another worker may have refreshed it already
+    expires_at = cache.sync(cache_key)
+    if not force and expires_at and expires_at - time.time() >= REFRESH_AHEAD:
+        return None
+    # Dead links are retried once their negative cache entry expires
+    failure = negative_cache.get(cache_key)
+    if failure is not None:
+        return failure.error
+    try:
+        _, error = extract_flight.do(cache_key, _refresh_extraction, url, cache_key)
+    except Rejected as e:
+        return e.message
+    return error
+
+def _refresh_extraction(url, cache_key):
+    with extract_limiter.slot():
+        return _extract_and_cache(url, cache_key)
+
+# Cached entries read within REFRESH_AHEAD seconds of expiring, and URLs
+# given to /api/admin/prefetch or prefetch.py, are re-extracted in the
+# background before the signed video URL in them goes stale
+REFRESH_AHEAD = int(os.getenv('REFRESH_AHEAD', 300))
+PREFETCH_WORKERS = int(os.getenv('PREFETCH_WORKERS', 2))
+PREFETCH_INTERVAL = int(os.getenv('PREFETCH_INTERVAL', 60))
+# Pins are shared through SQLite alongside the cache, so URLs prefetched by
+# any process on the node (prefetch.py included) are refreshed by the servers
+prefetcher = Prefetcher(
+    _refresh_video_info,
+    cache.expires_at,
+    get_cache_key,
+    workers=PREFETCH_WORKERS,
+    refresh_before=REFRESH_AHEAD,
+    pins=create_pins(CACHE_BACKEND, os.getenv('PREFETCH_DB_PATH'))
+)
+prefetch_scheduler = BackgroundScheduler(PREFETCH_INTERVAL, prefetcher.refresh_pinned, name='prefetch-refresh')
+
+def prefetch_urls(urls, download=False, force=False):
+    """
+    Warm the metadata cache for `urls` and keep them fresh, yielding one
+    result dict per URL; download=True also queues each video into the
+    disk cache as a download job
+    """
+    valid = []
+    for url in urls:
+        url = str(url).strip()
+        if url and _is_linkedin_url(url):
+            valid.append(url)
+        else:
+            yield {'url': url, 'status': 'failed', 'error': 'Please provide a valid LinkedIn URL'}
     
-    # All methods failed
-    return None, last_error or "Failed to extract video. The video may be private or require authentication."
+    for result in prefetcher.warm(valid, force=force):
+        if download and not result['error']:
+            try:
+                job = download_jobs.submit(get_cache_key(result['url']), result['url'])
+                result['job_id'], result['download'] = job.id, job.status
+            except QueueFull:
+                result['download'] = 'failed'
+                result['error'] = 'Too many downloads in progress'
+        yield result
 
 def _format_linkedin_error(error_msg, url):
     """Format user-friendly error messages for LinkedIn videos"""
@@ -254,16 +609,74 @@ def _format_linkedin_error(error_msg, url):
     else:
         return error_msg
 
+@app.before_request
+def start_background_tasks():
+    # Threads don't survive gunicorn's fork, so start lazily in each worker
+    cleanup_scheduler.start()
+    prefetch_scheduler.start()
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    # Streamed bodies (the proxy) are still being sent; this is time to first byte
+    start = g.get('request_start')
+    if start is not None:
+        REQUEST_SECONDS.labels(request.endpoint or 'unknown').observe(time.perf_counter() - start)
+    return response
+
+@app.errorhandler(Rejected)
+def rejected(e):
+    """Admission control turned the request away: 429 (client rate) or 503 (server full)"""
+    response = jsonify({'error': e.message})
+    response.status_code = e.status
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
+# Format policy when the client doesn't pass one (see formats.py):
+# FORMAT_DEFAULT picks download_url, FORMAT_PREVIEW the inline player's preview_url
+FORMAT_DEFAULT = os.getenv('FORMAT_DEFAULT', 'best')
+FORMAT_PREVIEW = os.getenv('FORMAT_PREVIEW', 'preview')
+
+def _extract_response(video_data, cache_key, selector=None):
+    """Build the /api/extract JSON payload for a VideoInfo record"""
+    title = sanitize_filename(video_data.title or 'LinkedIn Video')
+    
+    video_url, size = video_data.url, video_data.size
+    fmt = select_format(video_data.formats, selector or FORMAT_DEFAULT)
+    if fmt and fmt['url'] != video_url:
+        video_url, size = fmt['url'], fmt['filesize']
+    preview = select_format(video_data.formats, FORMAT_PREVIEW)
+    
+    # Size may still be resolving; clients can poll /api/size
+    size_pending = False
+    if not size and video_url:
+        size = size_prober.resolve(video_url)
+        size_pending = size is None
+    
+    return {
+        'success': True,
+        'title': title,
+        'duration': int(video_data.duration) if video_data.duration else 0,
+        'thumbnail': video_data.thumbnail,
+        'thumbnail_url': f'/api/thumbnail/{cache_key}?w={THUMBNAIL_WIDTH}' if video_data.thumbnail else None,
+        'download_url': video_url,
+        'preview_url': preview['url'] if preview else video_url,
+        'format': fmt['format_id'] if fmt else None,
+        'formats': video_data.formats,
+        'size': int(size) if size else 0,
+        'size_pending': size_pending
+    }
+
+def _is_linkedin_url(url):
+    return 'linkedin.com' in urlparse(url).netloc
+
 @app.route('/api/extract', methods=['POST'])
 def extract_video():
     """Extract video information - OPTIMIZED VERSION"""
-    # Cleanup old files periodically
-    cleanup_old_files()
-    
     data = request.get_json()
     url = data.get('url', '').strip()
     
@@ -271,73 +684,448 @@ def extract_video():
         return jsonify({'error': 'Please provide a URL'}), 400
     
     # Better URL validation
-    parsed = urlparse(url)
-    if 'linkedin.com' not in parsed.netloc:
+    if not _is_linkedin_url(url):
         return jsonify({'error': 'Please provide a valid LinkedIn URL'}), 400
     
-    # Single optimized call
-    video_data, error = get_video_info_optimized(url)
+    # Single optimized call ("retry" or Cache-Control: no-cache skips cached failures)
+    video_data, error = get_video_info_optimized(url, retry=_wants_retry(data), client=request.remote_addr)
     if error:
         return jsonify({'error': f'Failed to extract video: {error}'}), 500
     
     if not video_data:
         return jsonify({'error': 'No video found at this URL'}), 404
     
-    info = video_data['info']
-    video_url = video_data['video_url']
-    size = video_data['size']
-    duration = video_data['duration']
+    selector = data.get('format')
+    if selector and video_data.formats and not select_format(video_data.formats, selector):
+        return jsonify({'error': f'Unknown format: {selector}'}), 400
     
-    # Fallback size check
-    if not size:
-        size = info.get('filesize') or info.get('filesize_approx') or 0
+    return jsonify(_extract_response(video_data, get_cache_key(url), selector))
+
+def _wants_retry(data):
+    """Whether the client asked to bypass cached extraction failures"""
+    return bool(data.get('retry')) or 'no-cache' in request.headers.get('Cache-Control', '')
+
+def _batch_result(url, video_data, error, selector=None):
+    """One NDJSON line of /api/extract/batch output (same error text as /api/extract)"""
+    if error:
+        result = {'url': url, 'error': f'Failed to extract video: {error}'}
+    elif not video_data:
+        result = {'url': url, 'error': 'No video found at this URL'}
+    else:
+        result = dict(_extract_response(video_data, get_cache_key(url), selector), url=url)
+    return json.dumps(result) + '\n'
+
+def _group_batch_urls(urls):
+    """Split a batch into invalid URLs and valid ones grouped by cache key"""
+    # Grouped so duplicate URLs are extracted once
+    invalid = []
+    groups = {}
+    for url in urls:
+        url = str(url).strip()
+        if not url or not _is_linkedin_url(url):
+            invalid.append(url)
+            continue
+        groups.setdefault(get_cache_key(url), []).append(url)
+    return invalid, groups
+
+def _batch_lines(invalid, groups, retry=False, selector=None):
+    """
+    NDJSON result lines for a batch, one per URL, as soon as each is ready
+    (invalid URLs and cache hits first)
+    """
+    for url in invalid:
+        yield json.dumps({'url': url, 'error': 'Please provide a valid LinkedIn URL'}) + '\n'
     
-    # Prepare response
-    title = sanitize_filename(info.get('title', 'LinkedIn Video'))
+    pending = {}
+    for cache_key, group in groups.items():
+        cached_data = cache.get(cache_key)
+        failure = None if retry or cached_data is not None else negative_cache.get(cache_key)
+        if cached_data is not None:
+            prefetcher.touch(group[0], cache_key)
+        if cached_data is not None or failure is not None:
+            for url in dict.fromkeys(group):
+                yield _batch_result(url, cached_data, failure and failure.error, selector)
+        else:
+            # The batch as a whole was charged against the rate limit
+            future = batch_executor.submit(get_video_info_optimized, group[0], retry)
+            pending[future] = group
     
-    response = {
-        'success': True,
-        'title': title,
-        'duration': int(duration) if duration else 0,
-        'thumbnail': info.get('thumbnail') or (info.get('thumbnails', [{}])[0].get('url') if info.get('thumbnails') else None),
-        'download_url': video_url,
-        'size': int(size) if size else 0
-    }
+    for future in as_completed(pending):
+        group = pending[future]
+        try:
+            video_data, error = future.result()
+        except Exception as e:
+            video_data, error = None, str(e)
+        for url in dict.fromkeys(group):
+            yield _batch_result(url, video_data, error, selector)
+
+def _batch_results_path(job_id):
+    """Results file of a batch job, shared by all workers on the node"""
+    directory = os.path.join(get_download_dir(), 'batches')
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, job_id + '.ndjson')
+
+def _run_batch_job(job):
+    """Job worker: write a batch's result lines to its results file"""
+    path = _batch_results_path(job.id)
+    # Other workers see the .part file while it runs and the final name once done
+    try:
+        with open(path + '.part', 'w') as f:
+            for line in job.lines:
+                f.write(line)
+                f.flush()
+                job.completed += 1
+        os.replace(path + '.part', path)
+    except BaseException:
+        if os.path.exists(path + '.part'):
+            os.remove(path + '.part')
+        raise
+    return path, None
+
+def _read_batch_lines(job_id, start=0):
+    """Complete result lines a batch job has written so far, from line `start` on"""
+    path = _batch_results_path(job_id)
+    # .part first: a running job may rename it to the final name meanwhile
+    for candidate in (path + '.part', path):
+        try:
+            with open(candidate) as f:
+                lines = f.read().splitlines(keepends=True)
+            break
+        except FileNotFoundError:
+            continue
+    else:
+        return []
+    if lines and not lines[-1].endswith('\n'):
+        lines.pop()  # still being written
+    return lines[start:]
+
+def _prune_batch_results():
+    """Delete results files of batch jobs that finished over a job TTL ago"""
+    directory = os.path.join(get_download_dir(), 'batches')
+    cutoff = time.time() - batch_jobs.ttl
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+batch_jobs = JobQueue(_run_batch_job, workers=2, max_queued=BATCH_MAX_QUEUED, job_class=BatchJob)
+
+def _submit_batch_job(lines, total):
+    """Run a batch in the background and return the 202 response for it"""
+    try:
+        job = batch_jobs.submit(uuid.uuid4().hex, lines, total)
+    except QueueFull:
+        return jsonify({'error': 'Too many batches in progress. Please try again later.'}), 503
+    status = job.to_dict()
+    status['status_url'] = url_for('batch_status', job_id=job.id)
+    status['results_url'] = url_for('batch_results', job_id=job.id)
+    return jsonify(status), 202
+
+def _batch_status(job_id):
+    """
+    Status dict for a batch job, or None if unknown
+    Jobs live in the worker process that accepted them; other workers
+    answer from the results file
+    """
+    if not re.fullmatch(r'[0-9a-f]{32}', job_id):
+        return None
+    job = batch_jobs.get(job_id)
+    path = _batch_results_path(job_id)
+    if job is not None:
+        status = job.to_dict()
+    elif os.path.exists(path):
+        status = {'job_id': job_id, 'status': 'done', 'progress': 1.0}
+    elif os.path.exists(path + '.part'):
+        status = {'job_id': job_id, 'status': 'running', 'progress': None}
+    else:
+        return None
+    
+    if status['status'] != FAILED:
+        status['results_url'] = url_for('batch_results', job_id=job_id)
+    return status
+
+@app.route('/api/extract/batch', methods=['POST'])
+def extract_batch():
+    """
+    Extract many URLs in one call, streaming one NDJSON line per URL as soon
+    as its result is ready (cache hits first); batches of more than
+    BATCH_STREAM_MAX_URLS run as a background job instead
+    """
+    data = request.get_json()
+    urls = data.get('urls') if data else None
+    
+    if not isinstance(urls, list) or not urls:
+        return jsonify({'error': 'Please provide a list of URLs'}), 400
+    
+    if len(urls) > BATCH_MAX_URLS:
+        return jsonify({'error': f'At most {BATCH_MAX_URLS} URLs per batch'}), 400
+    
+    invalid, groups = _group_batch_urls(urls)
+    # One token per distinct uncached video, all spent before anything is
+    # submitted, so a batch costs what the same single extractions would;
+    # admin tooling (bulk archiving, prefetch) isn't limited
+    if not _is_admin():
+        misses = sum(cache.get(key, count=False) is None for key in groups)
+        rate_limiter.check(request.remote_addr, cost=misses)
+    
+    lines = _batch_lines(invalid, groups, _wants_retry(data), data.get('format'))
+    if len(urls) > BATCH_STREAM_MAX_URLS:
+        return _submit_batch_job(lines, len(urls))
+    return Response(lines, mimetype='application/x-ndjson')
+
+@app.route('/api/extract/batch/<job_id>')
+def batch_status(job_id):
+    """Poll a background batch"""
+    status = _batch_status(job_id)
+    if status is None:
+        return jsonify({'error': 'Unknown batch job'}), 404
+    return jsonify(status)
+
+@app.route('/api/extract/batch/<job_id>/results')
+def batch_results(job_id):
+    """
+    NDJSON results of a background batch
+    With ?partial=1 a running batch returns the lines written so far
+    (from line `start` on, for clients that already have the earlier ones)
+    """
+    status = _batch_status(job_id)
+    if status is None:
+        return jsonify({'error': 'Unknown batch job'}), 404
+    if status['status'] == FAILED:
+        return jsonify({'error': status['error']}), 500
+    partial = bool(request.args.get('partial', 0, type=int))
+    start = max(0, request.args.get('start', 0, type=int))
+    if status['status'] != 'done' and not partial:
+        return jsonify(status), 409
+    if status['status'] == 'done' and not start:
+        response = send_file(_batch_results_path(job_id), mimetype='application/x-ndjson')
+    else:
+        response = Response(''.join(_read_batch_lines(job_id, start)), mimetype='application/x-ndjson')
+    response.headers['X-Batch-Status'] = status['status']
+    return response
+
+@app.route('/api/thumbnail/<video_id>')
+def thumbnail(video_id):
+    """Resized, cached thumbnail of an extracted video (video_id is its cache key)"""
+    if not re.fullmatch(r'[0-9a-f]{32}', video_id):
+        return jsonify({'error': 'Unknown video'}), 404
+    
+    # The source URL is only needed the first time; after that the disk
+    # copy is served even once the metadata (and the signed URL) expired
+    video_data = cache.get(video_id, count=False)
+    source_url = video_data.thumbnail if video_data else None
+    thumb = get_thumbnails().get(video_id, source_url, request.args.get('w', type=int))
+    if thumb is None:
+        return jsonify({'error': 'Thumbnail not available'}), 404
+    
+    response = Response(thumb.data, mimetype=thumb.mimetype)
+    response.set_etag(thumb.etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = THUMBNAIL_MAX_AGE
+    return response.make_conditional(request)
+
+# Bearer token for /api/admin/*; unset disables them
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+
+def _is_admin():
+    auth = request.headers.get('Authorization', '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(auth.encode(), f'Bearer {ADMIN_TOKEN}'.encode())
+
+@app.route('/api/admin/prefetch', methods=['POST'])
+def admin_prefetch():
+    """
+    Pre-extract a list of URLs (and optionally download them) and keep them
+    fresh, streaming one NDJSON result line per URL (a background batch job
+    past BATCH_STREAM_MAX_URLS, like /api/extract/batch)
+    """
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'Admin endpoints are disabled'}), 404
+    if not _is_admin():
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    data = request.get_json(silent=True) or {}
+    urls = data.get('urls')
+    if not isinstance(urls, list) or not urls:
+        return jsonify({'error': 'Please provide a list of URLs'}), 400
+    if len(urls) > BATCH_MAX_URLS:
+        return jsonify({'error': f'At most {BATCH_MAX_URLS} URLs per request'}), 400
+    
+    results = prefetch_urls(urls, download=bool(data.get('download')), force=bool(data.get('force')))
+    lines = (json.dumps(result) + '\n' for result in results)
+    if len(urls) > BATCH_STREAM_MAX_URLS:
+        return _submit_batch_job(lines, len(urls))
+    return Response(lines, mimetype='application/x-ndjson')
+
+@app.route('/api/size')
+def video_size():
+    """Resolve the size of a download_url returned with size_pending"""
+    video_url = request.args.get('url', '')
+    
+    if not video_url:
+        return jsonify({'error': 'Please provide a video URL'}), 400
     
-    return jsonify(response)
+    size = size_prober.resolve(video_url, wait=size_prober.timeout)
+    return jsonify({
+        'size': size or 0,
+        'pending': size is None
+    })
+
+@app.route('/api/stats')
+def stats():
+    """Runtime counters for monitoring"""
+    return jsonify({
+        'extractions': extract_flight.stats(),
+        'strategies': extract_racer.stats(),
+        'fast_path': page_extractor.stats(),
+        'cache': cache.stats(),
+        'urls': url_stats.stats(),
+        'negative_cache': negative_cache.stats(),
+        'size_probe': size_prober.stats(),
+        'http': connection_stats(),
+        'video_cache': get_video_cache().stats(),
+        'thumbnails': get_thumbnails().stats(),
+        'cleanup': cleanup_scheduler.stats(),
+        'prefetch': dict(prefetcher.stats(), refresh=prefetch_scheduler.stats()),
+        'downloads': download_jobs.stats(),
+        'batches': batch_jobs.stats(),
+        'admission': {
+            'extractions': extract_limiter.stats(),
+            'proxy_streams': stream_limiter.stats(),
+            'rate_limit': rate_limiter.stats(),
+        }
+    })
+
+def select_video_url(url, selector, client=None):
+    """
+    CDN URL of the `selector` rendition of the LinkedIn post at `url`
+    Returns (video_url, error, status); raises Rejected like get_video_info_optimized
+    """
+    if not _is_linkedin_url(url):
+        return None, 'A format can only be selected for a LinkedIn post URL', 400
+    video_data, error = get_video_info_optimized(url, client=client)
+    if error:
+        return None, f'Failed to extract video: {error}', 500
+    if not video_data:
+        return None, 'No video found at this URL', 404
+    fmt = select_format(video_data.formats, selector)
+    if fmt is None and video_data.formats:
+        return None, f'Unknown format: {selector}', 400
+    # Entries cached before format lists existed only know the best URL
+    return (fmt['url'] if fmt else video_data.url), None, 200
+
+# Counters the caches already keep, read only when /metrics is scraped
+metrics.collector(
+    'cache_lookups_total', 'counter', 'Metadata cache lookups by result', ['result'],
+    lambda: {(result,): cache.stats()[key] for result, key in (('hit', 'hits'), ('miss', 'misses'))}
+)
+metrics.collector(
+    'cache_stale_total', 'counter', 'Metadata cache entries found expired on lookup', [],
+    lambda: {(): cache.stats()['expirations']}
+)
+metrics.collector(
+    'negative_cache_hits_total', 'counter', 'Requests answered from cached extraction failures', [],
+    lambda: {(): negative_cache.hits}
+)
+metrics.collector(
+    'extractions_deduplicated_total', 'counter', 'Requests that joined an extraction already running', [],
+    lambda: {(): extract_flight.deduplicated}
+)
+metrics.collector(
+    'admission_rejected_total', 'counter', 'Requests turned away by admission control', ['reason'],
+    lambda: {
+        ('rate_limit',): rate_limiter.limited,
+        ('extractions',): extract_limiter.rejected,
+        ('proxy_streams',): stream_limiter.rejected,
+    }
+)
+metrics.collector(
+    'prefetch_extractions_total', 'counter', 'Background prefetch and refresh-ahead extractions by result', ['result'],
+    lambda: {('warmed',): prefetcher.warmed, ('refreshed',): prefetcher.refreshed, ('failed',): prefetcher.failed}
+)
+metrics.collector(
+    'extractions_waiting', 'gauge', 'Extractions queued for a slot', [],
+    lambda: {(): extract_limiter.waiting}
+)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus text exposition of the metrics above (per worker process)"""
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 @app.route('/api/download-proxy')
 def download_proxy():
     """Proxy endpoint that forces download instead of opening in browser"""
     video_url = request.args.get('url', '')
     filename = request.args.get('filename', 'linkedin_video.mp4')
+    selector = request.args.get('format')
     
     if not video_url:
         return jsonify({'error': 'Please provide a video URL'}), 400
     
+    # With a format selector, `url` is the post and the rendition comes from
+    # its cached format list
+    if selector:
+        video_url, error, status = select_video_url(video_url, selector, request.remote_addr)
+        if error:
+            return jsonify({'error': error}), status
+    
+    # Already downloaded by /api/download: serve from disk (sendfile);
+    # conditional=True answers Range requests with 206 partial content
+    local_path = local_copies.get(video_url)
+    if local_path:
+        response = send_file(
+            local_path,
+            as_attachment=True,
+            download_name=filename,
+            mimetype='video/mp4',
+            conditional=True
+        )
+        PROXY_DISK_BYTES.inc(response.content_length or 0)
+        return response
+    
+    # The slot is held until the server closes the response, i.e. the stream ends
+    stream_limiter.acquire()
     try:
-        # Stream the video with download headers
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        
-        response = requests.get(video_url, headers=headers, stream=True, timeout=30)
-        response.raise_for_status()
-        
-        # Create Flask response with download headers
-        def generate():
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    yield chunk
+        response = app.make_response(_proxy_upstream(video_url, filename))
+    except BaseException:
+        stream_limiter.release()
+        raise
+    response.call_on_close(stream_limiter.release)
+    return response
+
+def _proxy_upstream(video_url, filename):
+    """Stream `video_url` from the CDN as a download"""
+    try:
+        # Stream the video over the shared keep-alive session
+        # Range/If-Range are passed through so seeks and resumes get a 206
+        response = get_session().get(
+            video_url,
+            headers=upstream_headers(request.headers),
+            stream=True,
+            timeout=30
+        )
+        if response.status_code == 416:
+            response.close()
+            return Response(status=416, headers={
+                'Content-Range': response.headers.get('Content-Range', '')
+            })
+        if not response.ok:
+            response.close()
+            response.raise_for_status()
         
+        # Create Flask response with download headers (large chunks read
+        # straight from urllib3; the connection goes back to the pool after)
         return Response(
-            generate(),
+            metered(iter_upstream(response), PROXY_UPSTREAM_BYTES, PROXY_STREAMS),
+            status=response.status_code,
             mimetype='video/mp4',
-            headers={
-                'Content-Disposition': f'attachment; filename="{filename}"',
-                'Content-Type': 'video/mp4',
-                'Content-Length': response.headers.get('Content-Length', '')
-            }
+            headers=proxy_headers(response, filename)
         )
         
     except requests.RequestException as e:
@@ -345,68 +1133,207 @@ def download_proxy():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+DOWNLOAD_FORMAT = 'best[ext=mp4]/best'
+DOWNLOAD_TIMEOUT = 120
+
+def _download_with_ytdlp(url, temp_base, progress_hook=None):
+    """Download `url` to temp_base.<ext>, returning an error message or None"""
+    if YT_DLP_AVAILABLE:
+        opts = {
+            'format': DOWNLOAD_FORMAT,
+            'outtmpl': temp_base + '.%(ext)s',
+            'quiet': True,
+            'no_warnings': True,
+            'noprogress': True,
+            'socket_timeout': EXTRACT_TIMEOUT,
+            'progress_hooks': [progress_hook] if progress_hook else [],
+        }
+        try:
+            with yt_dlp.YoutubeDL(opts) as ydl:
+                ydl.download([url])
+        except Exception as e:
+            return f'Download failed: {e}'
+        return None
+    
+    # CLI fallback (no progress reporting)
+    cmd = [
+        'yt-dlp',
+        '--format', DOWNLOAD_FORMAT,
+        '--output', temp_base + '.%(ext)s',
+        '--no-warnings',
+        url
+    ]
+    try:
+        result = subprocess.run(
+            cmd,
+            capture_output=True,
+            text=True,
+            timeout=DOWNLOAD_TIMEOUT
+        )
+    except subprocess.TimeoutExpired:
+        return 'Download timed out'
+    if result.returncode != 0:
+        return f'Download failed: {result.stderr}'
+    return None
+
+def _download_to_cache(url, cache_key, progress_hook=None):
+    """Download a video with yt-dlp into the disk cache, returning (path, error)"""
+    disk_cache = get_video_cache()
+    
+    video_file = disk_cache.get(cache_key)
+    if video_file:
+        return video_file, None
+    
+    # Unique temp name, renamed into place only once complete
+    temp_base = disk_cache.temp_path(cache_key)
+    error = _download_with_ytdlp(url, temp_base, progress_hook)
+    if error:
+        disk_cache.discard(temp_base)
+        return None, error
+    
+    # Find downloaded file (yt-dlp picks the extension)
+    for ext in VIDEO_EXTS:
+        if os.path.exists(temp_base + ext):
+            video_file = disk_cache.commit(cache_key, temp_base + ext)
+            if disk_cache.over_budget():
+                cleanup_scheduler.wake()
+            return video_file, None
+    
+    disk_cache.discard(temp_base)
+    return None, 'Downloaded file not found'
+
+def _run_download_job(job):
+    """Job worker: download into the disk cache (job.id is the cache key)"""
+    if job.format:
+        # A specific rendition: fetch its CDN URL rather than re-extracting the post
+        video_file, error = _download_to_cache(job.format['url'], job.id, job.progress_hook)
+        if video_file:
+            local_copies.add(job.format['url'], video_file)
+        return video_file, error
+    
+    video_file, error = _download_to_cache(extraction_url(job.url), job.id, job.progress_hook)
+    if video_file:
+        # Let the proxy serve later requests for this video from disk
+        video_data, _ = get_video_info_optimized(job.url)
+        if video_data and video_data.url:
+            local_copies.add(video_data.url, video_file)
+    return video_file, error
+
+def _format_job_id(cache_key, fmt):
+    """Job ID (and disk cache key) of one rendition: <cache key>-<format_id>"""
+    return cache_key + '-' + re.sub(r'[^A-Za-z0-9_-]', '_', fmt['format_id'])
+
+# Downloads run in the background on a bounded pool; clients poll the job
+DOWNLOAD_WORKERS = int(os.getenv('DOWNLOAD_WORKERS', 2))
+DOWNLOAD_MAX_QUEUED = int(os.getenv('DOWNLOAD_MAX_QUEUED', 100))
+download_jobs = JobQueue(_run_download_job, workers=DOWNLOAD_WORKERS, max_queued=DOWNLOAD_MAX_QUEUED)
+
+def _job_status(job_id):
+    """
+    Status dict for a download job, or None if unknown
+    Jobs live in the worker process that accepted them; other workers can
+    still answer from the shared disk cache
+    """
+    try:
+        job = download_jobs.get(job_id)
+        if job is not None:
+            status = job.to_dict()
+        elif get_video_cache().get(job_id):
+            status = {'job_id': job_id, 'status': 'done', 'progress': 1.0}
+        elif get_video_cache().in_progress(job_id):
+            status = {'job_id': job_id, 'status': 'running', 'progress': None}
+        else:
+            return None
+    except ValueError:
+        return None
+    
+    if status['status'] == 'done':
+        status['file_url'] = url_for('download_job_file', job_id=job_id)
+    return status
+
+def _download_exists(job_id):
+    """Whether a download job is running or done, or its file is cached"""
+    job = download_jobs.get(job_id)
+    if job is not None and job.status != FAILED:
+        return True
+    return get_video_cache().get(job_id) is not None
+
 @app.route('/api/download', methods=['POST'])
 def download_video():
-    """Download video and serve it"""
+    """Start (or join) a background download and return its job"""
     data = request.get_json()
     url = data.get('url', '').strip()
     
     if not url:
         return jsonify({'error': 'Please provide a URL'}), 400
     
-    try:
-        # Use cached info if available
-        video_data, error = get_video_info_optimized(url)
-        if error or not video_data:
-            filename = 'linkedin_video.mp4'
+    # Identical URLs attach to the same job (the job ID is the cache key,
+    # plus the format_id for anything but the best rendition)
+    job_id, fmt = get_cache_key(url), None
+    selector = data.get('format') or FORMAT_DEFAULT
+    if selector != BEST:
+        video_data, error = get_video_info_optimized(url, client=request.remote_addr)
+        if error:
+            return jsonify({'error': f'Failed to extract video: {error}'}), 500
+        if not video_data:
+            return jsonify({'error': 'No video found at this URL'}), 404
+        fmt = select_format(video_data.formats, selector)
+        if fmt is None and video_data.formats:
+            return jsonify({'error': f'Unknown format: {selector}'}), 400
+        if fmt is not None and fmt['url'] != video_data.url:
+            job_id = _format_job_id(job_id, fmt)
         else:
-            title = sanitize_filename(video_data['info'].get('title', 'linkedin_video'))
-            filename = f"{title}.mp4"
-        
-        # Download video
-        download_dir = get_download_dir()
-        temp_file = os.path.join(download_dir, filename)
-        
-        cmd = [
-            'yt-dlp',
-            '--format', 'best[ext=mp4]/best',
-            '--output', temp_file,
-            '--no-warnings',
-            url
-        ]
-        
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=120
-        )
-        
-        if result.returncode != 0:
-            return jsonify({'error': f'Download failed: {result.stderr}'}), 500
-        
-        # Find downloaded file
-        if not os.path.exists(temp_file):
-            base_name = temp_file.replace('.mp4', '')
-            for ext in ['.mp4', '.webm', '.m4a']:
-                if os.path.exists(base_name + ext):
-                    temp_file = base_name + ext
-                    break
-        
-        if not os.path.exists(temp_file):
-            return jsonify({'error': 'Downloaded file not found'}), 500
-        
-        return send_file(
-            temp_file,
-            as_attachment=True,
-            download_name=filename,
-            mimetype='video/mp4'
-        )
-        
-    except subprocess.TimeoutExpired:
-        return jsonify({'error': 'Download timed out'}), 500
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+            fmt = None
+    
+    # Joining a job or a file already on disk is free; a new download is
+    # charged, unless its extraction above already was
+    if not _download_exists(job_id):
+        _charge_client(request.remote_addr)
+    
+    try:
+        job = download_jobs.submit(job_id, url, fmt)
+    except QueueFull:
+        return jsonify({'error': 'Too many downloads in progress. Please try again later.'}), 503
+    
+    status = _job_status(job.id) or job.to_dict()
+    status['status_url'] = url_for('download_status', job_id=job.id)
+    return jsonify(status), 202
+
+@app.route('/api/download/<job_id>')
+def download_status(job_id):
+    """Poll a download job"""
+    status = _job_status(job_id)
+    if status is None:
+        return jsonify({'error': 'Unknown download job'}), 404
+    return jsonify(status)
+
+@app.route('/api/download/<job_id>/file')
+def download_job_file(job_id):
+    """Serve the file of a finished download job"""
+    try:
+        video_file = get_video_cache().get(job_id)
+    except ValueError:
+        video_file = None
+    
+    if not video_file:
+        status = _job_status(job_id)
+        if status is None:
+            return jsonify({'error': 'Unknown download job'}), 404
+        if status['status'] == 'failed':
+            return jsonify({'error': status['error']}), 500
+        return jsonify(status), 409
+    
+    # Metadata cache key is the job ID without the format suffix
+    video_data = cache.get(job_id.split('-', 1)[0], count=False)
+    title = sanitize_filename(video_data.title if video_data and video_data.title else 'linkedin_video')
+    
+    return send_file(
+        video_file,
+        as_attachment=True,
+        download_name=title + os.path.splitext(video_file)[1],
+        mimetype='video/mp4',
+        conditional=True
+    )
 
 if __name__ == '__main__':
     # Use environment variable for debug mode
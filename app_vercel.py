@@ -2,23 +2,27 @@
 Vercel-compatible version of app.py
 Uses yt-dlp Python API instead of subprocess
 """
-from flask import Flask, render_template, request, jsonify, send_file, Response
+from flask import Flask, request, jsonify, send_file, Response
 import json
 import os
 import re
-import requests
 import time
 import hashlib
 from urllib.parse import urlparse
-from threading import Lock
+from formats import select_format
+from metadata_cache import NegativeCache, VideoInfo, create_cache
+from page_extract import PageExtractor
+from linkedin_url import CanonicalStats, canonicalize, extraction_url, find_urn
+from scheduler import BackgroundScheduler
+from singleflight import SingleFlight
+from size_probe import SizeProber
+from strategy import classify_error
+from streaming import iter_upstream, proxy_headers, upstream_headers
 
-# Try to import yt-dlp Python API
-try:
-    import yt_dlp
-    YT_DLP_AVAILABLE = True
-except ImportError:
-    YT_DLP_AVAILABLE = False
-    print("Warning: yt-dlp not available. Install with: pip install yt-dlp")
+# yt-dlp (and requests) are imported on first use, not at cold start, so
+# requests for / don't pay for them; see get_video_info_optimized
+yt_dlp = None
+YT_DLP_AVAILABLE = False
 
 # Set template folder path for Vercel
 template_dir = os.path.join(os.path.dirname(__file__), 'templates')
@@ -42,46 +46,101 @@ def get_download_dir():
 
 # Cache configuration
 CACHE_TTL = 3600  # 1 hour
-cache = {}
-cache_lock = Lock()
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 1024))
+CACHE_MAX_BYTES = int(os.getenv('CACHE_MAX_BYTES', 16 * 1024 * 1024))
+# Serverless instances are single-process, so the per-process tier is enough
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory')
+CACHE_DB_PATH = os.getenv('CACHE_DB_PATH')
+cache = create_cache(
+    CACHE_BACKEND,
+    ttl=CACHE_TTL,
+    max_entries=CACHE_MAX_ENTRIES,
+    max_bytes=CACHE_MAX_BYTES,
+    path=CACHE_DB_PATH
+)
 
-# Cleanup old files
+# Concurrent extractions of the same URL share one yt-dlp run
+extract_flight = SingleFlight()
+
+# Cache hit counters for canonical (URN-based) keys
+url_stats = CanonicalStats()
+
+# Public posts are parsed straight from the page HTML, without importing
+# yt-dlp at all; it only runs when that fails
+FAST_EXTRACT = os.getenv('FAST_EXTRACT', 'true').lower() == 'true'
+page_extractor = PageExtractor()
+
+# Failed extractions are remembered for an error-class-specific TTL, so
+# retries of a private or deleted video don't re-run yt-dlp
+NEGATIVE_CACHE = os.getenv('NEGATIVE_CACHE', 'true').lower() == 'true'
+negative_cache = NegativeCache(cache, enabled=NEGATIVE_CACHE)
+
+# Format policy when the client doesn't pass one (see formats.py):
+# FORMAT_DEFAULT picks download_url, FORMAT_PREVIEW the inline player's preview_url
+FORMAT_DEFAULT = os.getenv('FORMAT_DEFAULT', 'best')
+FORMAT_PREVIEW = os.getenv('FORMAT_PREVIEW', 'preview')
+
+# HEAD requests for Content-Length run in the background; set SIZE_PROBE_WAIT
+# to wait briefly for them during extraction
+SIZE_PROBE_WAIT = float(os.getenv('SIZE_PROBE_WAIT', 0))
+size_prober = SizeProber()
+
+# Thumbnails proxied by /api/thumbnail, resized and cached in memory and
+# under /tmp (kept small: /tmp is limited on serverless instances)
+THUMBNAIL_CACHE_MAX_BYTES = int(os.getenv('THUMBNAIL_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+THUMBNAIL_QUALITY = int(os.getenv('THUMBNAIL_QUALITY', 80))
+THUMBNAIL_WIDTH = int(os.getenv('THUMBNAIL_WIDTH', 640))
+THUMBNAIL_MAX_AGE = int(os.getenv('THUMBNAIL_MAX_AGE', 86400))
+thumbnails = None
+
+def get_thumbnails():
+    """Lazy initialization of the thumbnail cache (imports Pillow)"""
+    global thumbnails
+    if thumbnails is None:
+        from thumbnails import ThumbnailCache
+        thumbnails = ThumbnailCache(
+            os.path.join(get_download_dir(), 'thumbnails'),
+            quality=THUMBNAIL_QUALITY,
+            max_bytes=THUMBNAIL_CACHE_MAX_BYTES
+        )
+    return thumbnails
+
+# Cleanup old files in the background, not on the request path
 CLEANUP_INTERVAL = 3600
-last_cleanup = time.time()
 
 def cleanup_old_files():
     """Remove files older than 1 hour"""
-    global last_cleanup
-    current_time = time.time()
-    
-    if current_time - last_cleanup < CLEANUP_INTERVAL:
-        return
-    
     download_dir = get_download_dir()
     
     # Skip cleanup on Vercel (read-only filesystem)
     if not os.access(download_dir, os.W_OK):
         return
     
+    current_time = time.time()
     try:
-        if os.path.exists(download_dir) and os.path.isdir(download_dir):
-            for filename in os.listdir(download_dir):
-                filepath = os.path.join(download_dir, filename)
-                if os.path.isfile(filepath):
-                    file_age = current_time - os.path.getmtime(filepath)
+        # scandir returns the stat info with the listing, no extra syscall per file
+        with os.scandir(download_dir) as entries:
+            for entry in entries:
+                try:
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    file_age = current_time - entry.stat(follow_symlinks=False).st_mtime
                     if file_age > CLEANUP_INTERVAL:
-                        try:
-                            os.remove(filepath)
-                        except (OSError, PermissionError):
-                            pass
-        last_cleanup = current_time
+                        os.remove(entry.path)
+                except (OSError, PermissionError):
+                    pass
     except Exception:
         # Silently fail on Vercel
         pass
+    
+    if thumbnails is not None:
+        thumbnails.maintain()
+
+cleanup_scheduler = BackgroundScheduler(CLEANUP_INTERVAL, cleanup_old_files, name='cleanup')
 
 def get_cache_key(url):
-    """Generate cache key from URL"""
-    return hashlib.md5(url.encode()).hexdigest()
+    """Generate cache key from the canonical form of a URL (see linkedin_url)"""
+    return hashlib.md5(canonicalize(url).encode()).hexdigest()
 
 def sanitize_filename(filename):
     """Remove invalid characters from filename"""
@@ -90,12 +149,79 @@ def sanitize_filename(filename):
     filename = filename.strip()
     return filename[:200]
 
-def get_video_info_optimized(url):
+def get_video_info_optimized(url, retry=False):
     """
     OPTIMIZED: Uses yt-dlp Python API instead of subprocess
+    retry=True ignores a cached failure and extracts again
+    """
+    cache_key = get_cache_key(url)
+    
+    cached_data = cache.get(cache_key)
+    url_stats.record(url, canonicalize(url), hit=cached_data is not None)
+    if cached_data is not None:
+        return cached_data, None
+    
+    # Failed recently: return the same error without running yt-dlp again
+    if not retry:
+        failure = negative_cache.get(cache_key)
+        if failure is not None:
+            return None, failure.error
+    
+    # Only one extraction per URL at a time; concurrent callers share its result
+    return extract_flight.do(cache_key, _extract_video_info, url, cache_key)
+
+def _create_ydl(opts, url):
+    """
+    YoutubeDL with only the LinkedIn extractors registered
+    Registering yt-dlp's full extractor list costs ~170 ms per instance; URLs
+    no LinkedIn extractor accepts still get the full list
     """
+    from yt_dlp.extractor.linkedin import LinkedInEventsIE, LinkedInIE
+    
+    extractors = [ie for ie in (LinkedInIE, LinkedInEventsIE) if ie.suitable(url)]
+    if not extractors:
+        return yt_dlp.YoutubeDL(opts)
+    
+    ydl = yt_dlp.YoutubeDL(opts, auto_init=False)
+    for ie in extractors:
+        ydl.add_info_extractor(ie())
+    return ydl
+
+def _store_video_info(cache_key, info):
+    """Project an info dict to a VideoInfo and cache it"""
+    # Extract video URL
+    video_url = info.get('url')
+    if not video_url and 'formats' in info and len(info['formats']) > 0:
+        video_url = info['formats'][0].get('url')
+    
+    # Prefer the size yt-dlp reported; otherwise probe it in the background
+    size = info.get('filesize') or info.get('filesize_approx') or 0
+    if not size and video_url:
+        size = size_prober.resolve(video_url, wait=SIZE_PROBE_WAIT) or 0
+    
+    # Keep only the fields the API serves, not the full info dict
+    response_data = VideoInfo.from_info(info, video_url, size)
+    
+    # Cache the result
+    cache.set(cache_key, response_data)
+    
+    return response_data, None
+
+def _extract_video_info(url, cache_key):
+    """Extract video info (page fast path, then the yt-dlp Python API) and cache it"""
+    # A previous flight may have finished between our cache check and now
+    cached_data = cache.get(cache_key, count=False)
+    if cached_data is not None:
+        return cached_data, None
+    
+    target_url = extraction_url(url)
+    if FAST_EXTRACT and find_urn(url):
+        info = page_extractor.extract(target_url)
+        if info is not None:
+            return _store_video_info(cache_key, info)
+    
     # Try to import yt-dlp if not available
-    global YT_DLP_AVAILABLE
+    global YT_DLP_AVAILABLE, yt_dlp
     if not YT_DLP_AVAILABLE:
         try:
             import yt_dlp
@@ -103,15 +229,6 @@ def get_video_info_optimized(url):
         except ImportError:
             return None, "yt-dlp Python package not available. Please install: pip install yt-dlp"
     
-    cache_key = get_cache_key(url)
-    
-    # Check cache
-    with cache_lock:
-        if cache_key in cache:
-            cached_data, cached_time = cache[cache_key]
-            if time.time() - cached_time < CACHE_TTL:
-                return cached_data, None
-    
     try:
         # Use yt-dlp Python API
         ydl_opts = {
@@ -121,58 +238,40 @@ def get_video_info_optimized(url):
             'extract_flat': False,
         }
         
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        with _create_ydl(ydl_opts, target_url) as ydl:
             try:
-                info = ydl.extract_info(url, download=False)
+                info = ydl.extract_info(target_url, download=False)
             except Exception as e:
                 # Better error message for debugging
                 error_msg = f"yt-dlp extraction failed: {str(e)}"
                 print(error_msg)  # Will show in Vercel logs
+                negative_cache.set(cache_key, error_msg, classify_error(str(e)))
                 return None, error_msg
             
-            # Extract video URL
-            video_url = info.get('url')
-            if not video_url and 'formats' in info and len(info['formats']) > 0:
-                video_url = info['formats'][0].get('url')
-            
-            # Get size from HTTP headers
-            size = 0
-            if video_url:
-                try:
-                    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-                    response = requests.head(video_url, headers=headers, timeout=5, allow_redirects=True)
-                    content_length = response.headers.get('Content-Length')
-                    if content_length:
-                        size = int(content_length)
-                except:
-                    pass
-            
-            # Prepare response data
-            response_data = {
-                'info': info,
-                'video_url': video_url,
-                'size': size,
-                'duration': info.get('duration', 0)
-            }
-            
-            # Cache the result
-            with cache_lock:
-                cache[cache_key] = (response_data, time.time())
-            
-            return response_data, None
+            return _store_video_info(cache_key, info)
             
     except Exception as e:
         return None, str(e)
 
+@app.before_request
+def start_background_tasks():
+    cleanup_scheduler.start()
+
+# index.html has no template logic, so it is read once and served as a static
+# asset instead of being compiled by Jinja on a cold instance
+_index_html = None
+
 @app.route('/')
 def index():
-    return render_template('index.html')
+    global _index_html
+    if _index_html is None:
+        with open(os.path.join(template_dir, 'index.html'), 'rb') as f:
+            _index_html = f.read()
+    return Response(_index_html, mimetype='text/html')
 
 @app.route('/api/extract', methods=['POST'])
 def extract_video():
     """Extract video information"""
-    cleanup_old_files()
-    
     data = request.get_json()
     url = data.get('url', '').strip()
     
@@ -183,64 +282,150 @@ def extract_video():
     if 'linkedin.com' not in parsed.netloc:
         return jsonify({'error': 'Please provide a valid LinkedIn URL'}), 400
     
-    video_data, error = get_video_info_optimized(url)
+    # "retry" or Cache-Control: no-cache skips cached failures
+    retry = bool(data.get('retry')) or 'no-cache' in request.headers.get('Cache-Control', '')
+    video_data, error = get_video_info_optimized(url, retry=retry)
     if error:
         return jsonify({'error': f'Failed to extract video: {error}'}), 500
     
     if not video_data:
         return jsonify({'error': 'No video found at this URL'}), 404
     
-    info = video_data['info']
-    video_url = video_data['video_url']
-    size = video_data['size']
-    duration = video_data['duration']
+    selector = data.get('format')
+    if selector and video_data.formats and not select_format(video_data.formats, selector):
+        return jsonify({'error': f'Unknown format: {selector}'}), 400
     
-    if not size:
-        size = info.get('filesize') or info.get('filesize_approx') or 0
+    title = sanitize_filename(video_data.title or 'LinkedIn Video')
     
-    title = sanitize_filename(info.get('title', 'LinkedIn Video'))
+    video_url, size = video_data.url, video_data.size
+    fmt = select_format(video_data.formats, selector or FORMAT_DEFAULT)
+    if fmt and fmt['url'] != video_url:
+        video_url, size = fmt['url'], fmt['filesize']
+    preview = select_format(video_data.formats, FORMAT_PREVIEW)
+    
+    # Size may still be resolving; clients can poll /api/size
+    size_pending = False
+    if not size and video_url:
+        size = size_prober.resolve(video_url)
+        size_pending = size is None
     
     response = {
         'success': True,
         'title': title,
-        'duration': int(duration) if duration else 0,
-        'thumbnail': info.get('thumbnail') or (info.get('thumbnails', [{}])[0].get('url') if info.get('thumbnails') else None),
+        'duration': int(video_data.duration) if video_data.duration else 0,
+        'thumbnail': video_data.thumbnail,
+        'thumbnail_url': f'/api/thumbnail/{get_cache_key(url)}?w={THUMBNAIL_WIDTH}' if video_data.thumbnail else None,
         'download_url': video_url,
-        'size': int(size) if size else 0
+        'preview_url': preview['url'] if preview else video_url,
+        'format': fmt['format_id'] if fmt else None,
+        'formats': video_data.formats,
+        'size': int(size) if size else 0,
+        'size_pending': size_pending
     }
     
     return jsonify(response)
 
+@app.route('/api/thumbnail/<video_id>')
+def thumbnail(video_id):
+    """Resized, cached thumbnail of an extracted video (video_id is its cache key)"""
+    if not re.fullmatch(r'[0-9a-f]{32}', video_id):
+        return jsonify({'error': 'Unknown video'}), 404
+    
+    video_data = cache.get(video_id, count=False)
+    source_url = video_data.thumbnail if video_data else None
+    thumb = get_thumbnails().get(video_id, source_url, request.args.get('w', type=int))
+    if thumb is None:
+        return jsonify({'error': 'Thumbnail not available'}), 404
+    
+    response = Response(thumb.data, mimetype=thumb.mimetype)
+    response.set_etag(thumb.etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = THUMBNAIL_MAX_AGE
+    return response.make_conditional(request)
+
+@app.route('/api/size')
+def video_size():
+    """Resolve the size of a download_url returned with size_pending"""
+    video_url = request.args.get('url', '')
+    
+    if not video_url:
+        return jsonify({'error': 'Please provide a video URL'}), 400
+    
+    size = size_prober.resolve(video_url, wait=size_prober.timeout)
+    return jsonify({
+        'size': size or 0,
+        'pending': size is None
+    })
+
+@app.route('/api/stats')
+def stats():
+    """Runtime counters for monitoring"""
+    from http_pool import connection_stats
+    
+    return jsonify({
+        'extractions': extract_flight.stats(),
+        'cache': cache.stats(),
+        'urls': url_stats.stats(),
+        'negative_cache': negative_cache.stats(),
+        'size_probe': size_prober.stats(),
+        'http': connection_stats(),
+        'thumbnails': thumbnails.stats() if thumbnails is not None else None,
+        'cleanup': cleanup_scheduler.stats()
+    })
+
 @app.route('/api/download-proxy')
 def download_proxy():
     """Proxy endpoint that forces download"""
     video_url = request.args.get('url', '')
     filename = request.args.get('filename', 'linkedin_video.mp4')
+    selector = request.args.get('format')
     
     if not video_url:
         return jsonify({'error': 'Please provide a video URL'}), 400
     
+    # With a format selector, `url` is the post and the rendition comes from
+    # its cached format list
+    if selector:
+        if 'linkedin.com' not in urlparse(video_url).netloc:
+            return jsonify({'error': 'A format can only be selected for a LinkedIn post URL'}), 400
+        video_data, error = get_video_info_optimized(video_url)
+        if error:
+            return jsonify({'error': f'Failed to extract video: {error}'}), 500
+        if not video_data:
+            return jsonify({'error': 'No video found at this URL'}), 404
+        fmt = select_format(video_data.formats, selector)
+        if fmt is None and video_data.formats:
+            return jsonify({'error': f'Unknown format: {selector}'}), 400
+        video_url = fmt['url'] if fmt else video_data.url
+    
+    import requests
+    from http_pool import get_session
+    
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        
-        response = requests.get(video_url, headers=headers, stream=True, timeout=30)
-        response.raise_for_status()
-        
-        def generate():
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    yield chunk
+        # Stream the video over the shared keep-alive session
+        # Range/If-Range are passed through so seeks and resumes get a 206
+        response = get_session().get(
+            video_url,
+            headers=upstream_headers(request.headers),
+            stream=True,
+            timeout=30
+        )
+        if response.status_code == 416:
+            response.close()
+            return Response(status=416, headers={
+                'Content-Range': response.headers.get('Content-Range', '')
+            })
+        if not response.ok:
+            response.close()
+            response.raise_for_status()
         
+        # Large chunks read straight from urllib3; the connection goes back
+        # to the pool when the stream ends
         return Response(
-            generate(),
+            iter_upstream(response),
+            status=response.status_code,
             mimetype='video/mp4',
-            headers={
-                'Content-Disposition': f'attachment; filename="{filename}"',
-                'Content-Type': 'video/mp4',
-                'Content-Length': response.headers.get('Content-Length', '')
-            }
+            headers=proxy_headers(response, filename)
         )
         
     except requests.RequestException as e:
@@ -0,0 +1,320 @@
+"""
+Async (ASGI) serving mode for app.py
+Run with:
+    uvicorn asgi:app --host 0.0.0.0 --port $PORT --workers 2
+    gunicorn asgi:app -k uvicorn.workers.UvicornWorker --workers 2
+
+All routes are the Flask ones from app.py. They run on a thread pool through
+a small WSGI bridge, so blocking yt-dlp extraction and downloads never stall
+the event loop. /api/download-proxy streams from the CDN natively on the
+event loop (with httpx when installed), so one process can hold hundreds of
+concurrent streams without a thread per stream.
+"""
+import asyncio
+import io
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import requests
+from werkzeug.wsgi import FileWrapper
+
+import app as flask_app_module
+from admission import Rejected
+from http_pool import HTTPX_AVAILABLE, get_async_client, get_session
+from streaming import PROXY_CHUNK_SIZE, iter_upstream, proxy_headers, upstream_headers
+
+if HTTPX_AVAILABLE:
+    import httpx
+    UPSTREAM_ERRORS = (requests.RequestException, httpx.HTTPError)
+else:
+    UPSTREAM_ERRORS = (requests.RequestException,)
+
+flask_app = flask_app_module.app
+
+# Threads for Flask views (extraction, /api/download) and blocking reads
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', 32))
+executor = ThreadPoolExecutor(max_workers=ASGI_THREADS, thread_name_prefix='asgi')
+
+
+class _LargeFileWrapper(FileWrapper):
+    """wsgi.file_wrapper that reads files (send_file) in large blocks"""
+
+    def __init__(self, file, buffer_size=8192):
+        super().__init__(file, max(buffer_size, PROXY_CHUNK_SIZE))
+
+
+def _build_environ(scope, body):
+    """Translate an ASGI HTTP scope into a WSGI environ"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+        'wsgi.file_wrapper': _LargeFileWrapper,
+    }
+    for raw_name, raw_value in scope['headers']:
+        name = raw_name.decode('latin-1')
+        value = raw_value.decode('latin-1')
+        if name == 'content-type':
+            environ['CONTENT_TYPE'] = value
+        elif name == 'content-length':
+            environ['CONTENT_LENGTH'] = value
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+async def _read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+    return body
+
+
+def _watch_disconnect(receive):
+    """Event that is set once the client goes away"""
+    disconnected = asyncio.Event()
+
+    async def watch():
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                disconnected.set()
+                return
+
+    task = asyncio.ensure_future(watch())
+    return disconnected, task
+
+
+async def _send_json(send, payload, status, headers=()):
+    body = json.dumps(payload).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            *_encode_headers(headers),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def _client_addr(scope):
+    """
+    Client IP for rate limiting, resolved like ProxyFix does for the Flask
+    routes: the TRUSTED_PROXIES-th X-Forwarded-For entry from the right
+    """
+    addr = (scope.get('client') or (None,))[0]
+    trusted = flask_app_module.TRUSTED_PROXIES
+    if not trusted:
+        return addr
+    forwarded = ','.join(
+        value.decode('latin-1') for name, value in scope['headers'] if name == b'x-forwarded-for'
+    )
+    values = [value.strip() for value in forwarded.split(',')] if forwarded else []
+    if len(values) >= trusted:
+        return values[-trusted]
+    return addr
+
+
+def _encode_headers(headers):
+    return [(name.lower().encode('latin-1'), str(value).encode('latin-1')) for name, value in headers]
+
+
+async def wsgi_bridge(scope, receive, send):
+    """Run the Flask app for this request on the thread pool"""
+    loop = asyncio.get_running_loop()
+    body = await _read_body(receive)
+    environ = _build_environ(scope, body)
+    disconnected, watcher = _watch_disconnect(receive)
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = headers
+
+    iterable = await loop.run_in_executor(executor, flask_app, environ, start_response)
+    iterator = iter(iterable)
+    try:
+        # Pull the first chunk before sending headers (start_response may be lazy)
+        chunk = await loop.run_in_executor(executor, next, iterator, None)
+        await send({
+            'type': 'http.response.start',
+            'status': started['status'],
+            'headers': _encode_headers(started['headers']),
+        })
+        while chunk is not None and not disconnected.is_set():
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            chunk = await loop.run_in_executor(executor, next, iterator, None)
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        watcher.cancel()
+        close = getattr(iterable, 'close', None)
+        if close is not None:
+            await loop.run_in_executor(executor, close)
+
+
+async def _stream_httpx(video_url, client_headers, filename, send, disconnected):
+    client = get_async_client()
+    request = client.build_request('GET', video_url, headers=upstream_headers(client_headers))
+    response = await client.send(request, stream=True)
+    try:
+        if response.status_code == 416:
+            await send({
+                'type': 'http.response.start',
+                'status': 416,
+                'headers': [(b'content-range', response.headers.get('Content-Range', '').encode('latin-1'))],
+            })
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        response.raise_for_status()
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': _encode_headers(proxy_headers(response, filename).items()),
+        })
+        async for chunk in response.aiter_raw(PROXY_CHUNK_SIZE):
+            if disconnected.is_set():
+                return
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        await response.aclose()
+
+
+async def _stream_threaded(video_url, client_headers, filename, send, disconnected):
+    """Fallback without httpx: blocking reads of the pooled session on the thread pool"""
+    loop = asyncio.get_running_loop()
+    response = await loop.run_in_executor(executor, lambda: get_session().get(
+        video_url,
+        headers=upstream_headers(client_headers),
+        stream=True,
+        timeout=30
+    ))
+    if response.status_code == 416:
+        response.close()
+        await send({
+            'type': 'http.response.start',
+            'status': 416,
+            'headers': [(b'content-range', response.headers.get('Content-Range', '').encode('latin-1'))],
+        })
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+    if not response.ok:
+        response.close()
+        response.raise_for_status()
+    chunks = iter_upstream(response)
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': _encode_headers(proxy_headers(response, filename).items()),
+        })
+        while not disconnected.is_set():
+            chunk = await loop.run_in_executor(executor, next, chunks, None)
+            if chunk is None:
+                break
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        await loop.run_in_executor(executor, chunks.close)
+
+
+async def download_proxy(scope, receive, send):
+    """Native async /api/download-proxy (same behaviour as the Flask route)"""
+    params = parse_qs(scope['query_string'].decode('latin-1'))
+    video_url = params.get('url', [''])[0]
+    filename = params.get('filename', ['linkedin_video.mp4'])[0]
+    selector = params.get('format', [''])[0]
+
+    # A format selector may need an extraction, which blocks: run it on the pool
+    if video_url and selector:
+        loop = asyncio.get_running_loop()
+        client = _client_addr(scope)
+        try:
+            video_url, error, status = await loop.run_in_executor(
+                executor, flask_app_module.select_video_url, video_url, selector, client
+            )
+        except Rejected as e:
+            return await _send_json(send, {'error': e.message}, e.status, [('Retry-After', e.retry_after)])
+        if error:
+            return await _send_json(send, {'error': error}, status)
+
+    # Missing URL and local copies (send_file + Range) are handled by Flask
+    if not video_url or flask_app_module.local_copies.get(video_url):
+        return await wsgi_bridge(scope, receive, send)
+
+    client_headers = {
+        name.decode('latin-1').title(): value.decode('latin-1')
+        for name, value in scope['headers']
+    }
+    started = False
+
+    upstream_bytes = flask_app_module.PROXY_UPSTREAM_BYTES
+
+    async def tracked_send(message):
+        nonlocal started
+        if message['type'] == 'http.response.start':
+            started = True
+        elif message['type'] == 'http.response.body':
+            upstream_bytes.inc(len(message.get('body', b'')))
+        await send(message)
+
+    disconnected, watcher = _watch_disconnect(receive)
+    stream = _stream_httpx if HTTPX_AVAILABLE else _stream_threaded
+    flask_app_module.PROXY_STREAMS.inc()
+    try:
+        await stream(video_url, client_headers, filename, tracked_send, disconnected)
+    except Exception as e:
+        # Once streaming has begun the status can't change; just end the response
+        if started:
+            return
+        if isinstance(e, UPSTREAM_ERRORS):
+            await _send_json(send, {'error': f'Failed to download video: {str(e)}'}, 500)
+        else:
+            await _send_json(send, {'error': str(e)}, 500)
+    finally:
+        flask_app_module.PROXY_STREAMS.dec()
+        watcher.cancel()
+
+
+async def app(scope, receive, send):
+    """ASGI entry point"""
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    if scope['type'] != 'http':
+        return
+    if scope['path'] == '/api/download-proxy':
+        return await download_proxy(scope, receive, send)
+    return await wsgi_bridge(scope, receive, send)
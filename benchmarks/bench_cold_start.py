@@ -0,0 +1,88 @@
+"""
+Benchmark: serverless cold start
+
+Each run starts a fresh Python process (like a cold Vercel instance) and
+measures:
+  import   - importing the entry point (api/index.py, or app.py with --app local)
+  /        - time to the first response for the index page
+  extract  - time to the first /api/extract response, which includes
+             importing yt-dlp and setting up its extractor
+
+The extract request goes to a real LinkedIn URL (--url). Offline it fails at
+DNS after yt-dlp is loaded, which still measures the import and setup cost.
+
+Usage:
+    python benchmarks/bench_cold_start.py [--runs 5] [--app vercel|local] [--url URL]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from fixtures import ROOT
+
+DEFAULT_URL = 'https://www.linkedin.com/posts/someone_demo-activity-7123456789012345678-AbCd'
+
+CHILD = r'''
+import json, os, sys, time
+root, target, url = sys.argv[1:4]
+start = time.perf_counter()
+if target == 'vercel':
+    sys.path.insert(0, os.path.join(root, 'api'))
+    from index import app
+else:
+    sys.path.insert(0, root)
+    from app import app
+imported = time.perf_counter()
+client = app.test_client()
+index_status = client.get('/').status_code
+index_done = time.perf_counter()
+extract_status = client.post('/api/extract', json={'url': url}).status_code
+extract_done = time.perf_counter()
+print(json.dumps({
+    'import': imported - start,
+    'index': index_done - imported,
+    'extract': extract_done - index_done,
+    'statuses': [index_status, extract_status],
+    'yt_dlp_modules': sum(1 for name in sys.modules if name.startswith('yt_dlp')),
+}))
+'''
+
+
+def run_once(target, url):
+    env = dict(os.environ, NEGATIVE_CACHE='false', CACHE_BACKEND='memory')
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD, ROOT, target, url],
+        capture_output=True,
+        text=True,
+        timeout=120,
+        env=env,
+    )
+    if result.returncode != 0:
+        raise SystemExit(result.stderr)
+    # The entry point may print to stdout; the timings are the last line
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--app', choices=('vercel', 'local'), default='vercel')
+    parser.add_argument('--url', default=DEFAULT_URL)
+    args = parser.parse_args()
+
+    runs = [run_once(args.app, args.url) for _ in range(args.runs)]
+    for phase in ('import', 'index', 'extract'):
+        samples = [r[phase] * 1000 for r in runs]
+        print(
+            f'{phase:<8} median {statistics.median(samples):8.1f} ms  '
+            f'min {min(samples):8.1f} ms  max {max(samples):8.1f} ms'
+        )
+    last = runs[-1]
+    print(f'statuses (/, /api/extract): {last["statuses"]}  yt_dlp modules loaded: {last["yt_dlp_modules"]}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Benchmark: yt-dlp CLI subprocess per request vs warm in-process YoutubeDL pool
+
+Both paths run the real yt-dlp (generic extractor) against a local fixture
+server, so the numbers reflect process spawn / import overhead rather than
+network latency. The fixture server runs in this process and does the same
+work for both paths.
+
+Usage:
+    python benchmarks/bench_extract.py [--requests 20]
+"""
+import argparse
+import resource
+import statistics
+import time
+
+from fixtures import FixtureServer
+
+import app
+
+
+def _children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run(label, extract, server, requests):
+    method = app.EXTRACT_METHODS[0]
+    latencies = []
+    cpu_start = time.process_time() + _children_cpu()
+    for i in range(requests):
+        url = server.url(f'/video.mp4?n={i}')
+        start = time.perf_counter()
+        info, error = extract(url, method)
+        latencies.append(time.perf_counter() - start)
+        if error:
+            raise SystemExit(f'{label} failed: {error}')
+    cpu = time.process_time() + _children_cpu() - cpu_start
+    print(
+        f'{label:<12} mean {statistics.mean(latencies) * 1000:8.1f} ms  '
+        f'p50 {statistics.median(latencies) * 1000:8.1f} ms  '
+        f'cpu/request {cpu / requests * 1000:8.1f} ms'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=20)
+    args = parser.parse_args()
+
+    with FixtureServer() as server:
+        # One warm-up call each so the pool and page cache are primed
+        app._extract_in_process(server.url('/video.mp4?warmup'), app.EXTRACT_METHODS[0])
+        run('subprocess', app._extract_subprocess, server, args.requests)
+        run('pooled', app._extract_in_process, server, args.requests)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+Benchmark: full yt-dlp info dict vs the projected fields
+
+Runs yt-dlp's LinkedIn extractor on the saved post page (benchmarks/pages,
+through the local fixture server) and on a copy listing --renditions
+renditions with real-length signed CDN URLs. For each info dict it compares
+what the CLI path used to do (parse the --dump-json document) with the
+--print templates the app now uses (app.PRINT_TEMPLATES, evaluated by
+yt-dlp itself):
+  output    bytes yt-dlp writes to stdout
+  parse     json.loads / parse_printed_info + VideoInfo.from_info per entry
+  peak      peak memory allocated while parsing one entry
+  retained  the full info dict in memory vs the cached VideoInfo
+
+Both must produce the same VideoInfo.
+
+Usage:
+    python benchmarks/bench_info_projection.py [--renditions 8] [--iterations 2000]
+"""
+import argparse
+import html
+import json
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+
+from fixtures import FixtureServer, load_page
+
+import yt_dlp
+from app import PRINT_TEMPLATES, parse_printed_info
+from metadata_cache import VideoInfo
+
+POST_URL = 'http://www.linkedin.com/posts/jane-doe_product-launch-activity-7123456789012345678-AbCd'
+_SOURCES_RE = re.compile(r'data-sources="([^"]*)"')
+HEIGHTS = (240, 360, 480, 540, 640, 720, 1080, 1440)
+
+
+class _QuietLogger:
+    def debug(self, msg):
+        pass
+
+    warning = error = debug
+
+
+def widened_page(page, renditions):
+    """The saved page with `renditions` sources whose URLs are as long as real ones"""
+    sources = [{
+        'src': (
+            f'https://dms.licdn.com/playlist/vid/v2/D4E05AQHx1yZkQ7Wb9g/mp4-{height}p-30fp-crf28/0/'
+            f'1700000000000?e=1700600000&v=beta&t={"Xq3dJ8mPz1" * 4}{index:03d}'
+        ),
+        'type': 'video/mp4',
+        'data-bitrate': height * 3000,
+    } for index, height in enumerate((HEIGHTS * renditions)[:renditions])]
+    escaped = html.escape(json.dumps(sources), quote=True)
+    return _SOURCES_RE.sub(lambda _: f'data-sources="{escaped}"', page, count=1)
+
+
+def deep_size(obj, seen=None):
+    """Bytes held by an object graph of dicts, lists and scalars"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(deep_size(item, seen) for item in obj)
+    return size
+
+
+def per_entry(parse, document, iterations):
+    """Median seconds and peak bytes to turn one stdout document into a VideoInfo"""
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        parse(document)
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    parse(document)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(timings), peak
+
+
+def compare(label, ydl, info, iterations):
+    full = json.dumps(ydl.sanitize_info(info))
+    printed = '\n'.join(ydl.evaluate_outtmpl(template, info) for template in PRINT_TEMPLATES)
+
+    def parse_full(document):
+        return VideoInfo.from_info(json.loads(document))
+
+    def parse_printed(document):
+        return VideoInfo.from_info(parse_printed_info(document))
+
+    if parse_full(full).to_dict() != parse_printed(printed).to_dict():
+        raise SystemExit(f'{label}: --dump-json and --print produce different entries')
+
+    full_time, full_peak = per_entry(parse_full, full, iterations)
+    printed_time, printed_peak = per_entry(parse_printed, printed, iterations)
+    full_retained = deep_size(json.loads(full))
+    retained = parse_printed(printed).estimated_size()
+
+    print(f'{label} ({len(info.get("formats") or [])} formats)')
+    rows = (
+        ('output', len(full), len(printed), 'B'),
+        ('parse', full_time * 1e6, printed_time * 1e6, 'us'),
+        ('peak', full_peak, printed_peak, 'B'),
+        ('retained', full_retained, retained, 'B'),
+    )
+    for name, before, after, unit in rows:
+        print(f'  {name:<9} --dump-json {before:10.1f} {unit:<2}  --print {after:10.1f} {unit:<2}  {before / after:5.1f}x')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--renditions', type=int, default=8)
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    page = load_page('linkedin_post.html')
+    pages = {
+        '/posts/wide': widened_page(page.decode(), args.renditions).encode(),
+        '/posts/': page,
+    }
+    with FixtureServer(pages=pages) as fixture:
+        ydl = yt_dlp.YoutubeDL({
+            'format': 'best[ext=mp4]/best',
+            'quiet': True,
+            'no_warnings': True,
+            'proxy': fixture.base_url,
+            'logger': _QuietLogger(),
+        })
+        saved = ydl.extract_info(POST_URL, download=False)
+        wide = ydl.extract_info(POST_URL.replace('/posts/', '/posts/wide'), download=False)
+
+    compare('saved post page', ydl, saved, args.iterations)
+    compare(f'{args.renditions} renditions', ydl, wide, args.iterations)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark: cost of the metrics instrumentation on the hot path
+
+Times the recording primitives (bound histogram observe, labelled counter
+inc) single-threaded and from several threads at once, and compares them
+with a cache-hit /api/extract request, which records one cache lookup, the
+request time and nothing else.
+
+Usage:
+    python benchmarks/bench_metrics.py [--ops 200000] [--threads 8]
+"""
+import argparse
+import statistics
+import threading
+import time
+
+import fixtures  # noqa: F401 (puts the app modules on sys.path)
+
+import app
+from metadata_cache import VideoInfo
+from metrics import Registry
+
+POST_URL = 'https://www.linkedin.com/feed/update/urn:li:activity:7123456789012345678/'
+
+
+def per_op(label, op, ops, threads=1):
+    def work():
+        for _ in range(ops // threads):
+            op()
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    print(f'{label:<36} {elapsed / ops * 1e9:8.0f} ns/op')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--ops', type=int, default=200000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    registry = Registry('bench')
+    stage = registry.histogram('stage_seconds', 'bench', ['stage']).labels('cache_lookup')
+    attempts = registry.counter('attempts_total', 'bench', ['method', 'result'])
+
+    per_op('histogram observe (bound)', lambda: stage.observe(0.0004), args.ops)
+    per_op('counter labels().inc()', lambda: attempts.labels('best', 'success').inc(), args.ops)
+    per_op(f'histogram observe, {args.threads} threads', lambda: stage.observe(0.0004), args.ops, args.threads)
+    per_op('time.perf_counter() pair', lambda: time.perf_counter() - time.perf_counter(), args.ops)
+
+    # Cache hit: the path the instrumentation must not slow down
+    app.cache.set(app.get_cache_key(POST_URL), VideoInfo(title='Bench', url='https://cdn.example/v.mp4', size=1))
+    client = app.app.test_client()
+    latencies = []
+    for _ in range(args.requests):
+        start = time.perf_counter()
+        client.post('/api/extract', json={'url': POST_URL})
+        latencies.append(time.perf_counter() - start)
+    print(f'{"cache-hit /api/extract":<36} {statistics.median(latencies) * 1e6:8.0f} us median')
+
+    start = time.perf_counter()
+    body = client.get('/metrics').get_data()
+    print(f'{"/metrics render":<36} {(time.perf_counter() - start) * 1e3:8.2f} ms ({len(body)} bytes)')
+
+
+if __name__ == '__main__':
+    main()
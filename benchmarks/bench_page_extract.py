@@ -0,0 +1,98 @@
+"""
+Benchmark: native page parsing (page_extract) vs yt-dlp's LinkedIn extractor
+
+Both paths fetch the same saved post page (benchmarks/pages) through the
+local fixture server, used as an HTTP proxy for http://www.linkedin.com, so
+the numbers reflect parsing and extractor overhead rather than network.
+A warm YoutubeDL is reused across requests, as the app's pool does.
+
+Also times a miss: a login-wall page, where the fast path finds no video
+and the app falls back to yt-dlp.
+
+Usage:
+    python benchmarks/bench_page_extract.py [--requests 50]
+"""
+import argparse
+import statistics
+import time
+import tracemalloc
+
+from fixtures import FixtureServer, load_page
+
+import yt_dlp
+from http_pool import create_session
+from page_extract import PageExtractor
+
+POST_URL = 'http://www.linkedin.com/posts/jane-doe_product-launch-activity-7123456789012345678-AbCd'
+PRIVATE_URL = 'http://www.linkedin.com/posts/private_members-only-activity-7000000000000000001-ZzZz'
+
+
+class _QuietLogger:
+    def debug(self, msg):
+        pass
+
+    warning = error = debug
+
+
+def measure(label, extract, url, requests):
+    extract(url)  # warm up
+    latencies = []
+    cpu_start = time.process_time()
+    for _ in range(requests):
+        start = time.perf_counter()
+        extract(url)
+        latencies.append(time.perf_counter() - start)
+    cpu = time.process_time() - cpu_start
+
+    tracemalloc.start()
+    extract(url)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    print(
+        f'{label:<16} mean {statistics.mean(latencies) * 1000:7.2f} ms  '
+        f'p95 {sorted(latencies)[int(len(latencies) * 0.95) - 1] * 1000:7.2f} ms  '
+        f'cpu/req {cpu / requests * 1000:7.2f} ms  peak mem {peak / 1024:8.1f} KiB'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=50)
+    args = parser.parse_args()
+
+    pages = {
+        '/posts/private_': load_page('linkedin_login.html'),
+        '/posts/': load_page('linkedin_post.html'),
+    }
+    with FixtureServer(pages=pages) as fixture:
+        session = create_session()
+        session.proxies = {'http': fixture.base_url}
+        native = PageExtractor(session=session)
+
+        ydl = yt_dlp.YoutubeDL({
+            'format': 'best[ext=mp4]/best',
+            'quiet': True,
+            'no_warnings': True,
+            'proxy': fixture.base_url,
+            'logger': _QuietLogger(),
+        })
+
+        def ytdlp_extract(url):
+            try:
+                return ydl.extract_info(url, download=False)
+            except yt_dlp.utils.DownloadError:
+                return None
+
+        fast, slow = native.extract(POST_URL), ytdlp_extract(POST_URL)
+        if not fast or not slow or fast['url'] != slow['url']:
+            raise SystemExit(f'paths disagree:\n  native {fast and fast["url"]}\n  yt-dlp {slow and slow["url"]}')
+
+        measure('native', native.extract, POST_URL, args.requests)
+        measure('yt-dlp', ytdlp_extract, POST_URL, args.requests)
+        measure('native (miss)', native.extract, PRIVATE_URL, args.requests)
+        measure('yt-dlp (miss)', ytdlp_extract, PRIVATE_URL, args.requests)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark: /api/download-proxy throughput and server CPU per stream
+
+Runs app.py under gunicorn (one sync worker) against a local fixture server
+and compares:
+  8k      - 8 KB chunks (the old iter_content setting)
+  1m      - PROXY_CHUNK_SIZE default (1 MiB)
+  local   - file already on disk after /api/download (send_file / sendfile)
+
+Usage:
+    python benchmarks/bench_proxy.py [--size-mb 64] [--streams 8]
+"""
+import argparse
+import time
+from urllib.parse import quote
+
+import requests
+
+from fixtures import FixtureServer, GunicornServer
+
+
+def wait_for_download(server, video_url, timeout=120):
+    response = requests.post(server.base_url + '/api/download', json={'url': video_url}, timeout=10)
+    response.raise_for_status()
+    status_url = server.base_url + response.json()['status_url']
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = requests.get(status_url, timeout=10).json()
+        if status['status'] == 'done':
+            return
+        if status['status'] == 'failed':
+            raise RuntimeError(status['error'])
+        time.sleep(0.2)
+    raise TimeoutError('download job did not finish')
+
+
+def measure(label, server, proxy_url, streams, size):
+    cpu_start = server.cpu_seconds()
+    start = time.perf_counter()
+    received = 0
+    for _ in range(streams):
+        with requests.get(proxy_url, stream=True, timeout=120) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=1024 * 1024):
+                received += len(chunk)
+    elapsed = time.perf_counter() - start
+    cpu = server.cpu_seconds() - cpu_start
+    if received != size * streams:
+        raise SystemExit(f'{label}: expected {size * streams} bytes, got {received}')
+    print(
+        f'{label:<6} {received / elapsed / 1e6:8.1f} MB/s  '
+        f'server cpu {cpu / elapsed * 100:5.1f}%  '
+        f'cpu/stream {cpu / streams * 1000:7.1f} ms'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--size-mb', type=int, default=64)
+    parser.add_argument('--streams', type=int, default=8)
+    args = parser.parse_args()
+    size = args.size_mb * 1024 * 1024
+
+    with FixtureServer(size=size) as fixture:
+        # Size in the URL: /api/download caches by URL, so reruns reuse the file
+        video_url = fixture.url(f'/bench-{size}.mp4')
+        proxy_path = f'/api/download-proxy?url={quote(video_url, safe="")}&filename=v.mp4'
+        env = {'CACHE_BACKEND': 'memory'}
+
+        for label, chunk_size in (('8k', 8192), ('1m', 1024 * 1024)):
+            with GunicornServer(env=dict(env, PROXY_CHUNK_SIZE=str(chunk_size))) as server:
+                measure(label, server, server.base_url + proxy_path, args.streams, size)
+
+        with GunicornServer(env=env) as server:
+            # An /api/download job fetches the file with yt-dlp and registers the local copy
+            wait_for_download(server, video_url)
+            measure('local', server, server.base_url + proxy_path, args.streams, size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Check URL canonicalization against a corpus and measure the cache hit rate
+
+Every URL in a corpus group must canonicalize to the group's key. The hit
+rate is simulated over all corpus URLs (or a traffic log with one URL per
+line) with raw-URL keys and with canonical keys; a miss is the first lookup
+of a key.
+
+Usage:
+    python benchmarks/check_canonical.py [--corpus benchmarks/url_corpus.json] [--log urls.txt]
+"""
+import argparse
+import json
+import os
+import sys
+
+import fixtures  # noqa: F401 (puts the app modules on sys.path)
+from linkedin_url import canonicalize, extraction_url
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'url_corpus.json')
+
+
+def check(groups):
+    failures = 0
+    for group in groups:
+        for url in group['urls']:
+            canonical = canonicalize(url)
+            if canonical != group['canonical']:
+                failures += 1
+                print(f'FAIL {url}\n     got {canonical}\n     want {group["canonical"]}')
+            # yt-dlp must get a LinkedIn URL it can still parse
+            if not extraction_url(url).startswith('https://www.linkedin.com/'):
+                failures += 1
+                print(f'FAIL extraction_url({url}) = {extraction_url(url)}')
+    return failures
+
+
+def hit_rate(urls, key):
+    seen = set()
+    hits = 0
+    for url in urls:
+        k = key(url)
+        if k in seen:
+            hits += 1
+        seen.add(k)
+    return hits / len(urls) if urls else 0.0, len(seen)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS)
+    parser.add_argument('--log', help='Traffic sample, one URL per line')
+    args = parser.parse_args()
+
+    with open(args.corpus) as f:
+        groups = json.load(f)
+    failures = check(groups)
+    total = sum(len(group['urls']) for group in groups)
+    print(f'{total - failures}/{total} corpus URLs canonicalized correctly')
+
+    if args.log:
+        with open(args.log) as f:
+            urls = [line.strip() for line in f if line.strip()]
+    else:
+        urls = [url for group in groups for url in group['urls']]
+
+    for label, key in (('raw', lambda url: url), ('canonical', canonicalize)):
+        rate, keys = hit_rate(urls, key)
+        print(f'{label:<10} {keys:6d} keys  hit rate {rate:6.1%}  ({len(urls)} lookups)')
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+"""
+Local stand-ins used by the benchmarks
+Serves deterministic video bytes over HTTP so yt-dlp (in-process or CLI) and
+the download proxy can be exercised without touching LinkedIn
+"""
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+from urllib.request import urlopen
+
+# Make the app modules importable when running `python benchmarks/...`
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+# Write size when a bandwidth limit is set
+THROTTLE_CHUNK = 64 * 1024
+
+
+def video_bytes(size):
+    """Deterministic payload of `size` bytes"""
+    pattern = bytes(range(256))
+    return (pattern * (size // 256 + 1))[:size]
+
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are separate writes; don't let Nagle delay keep-alive replies
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_video(self, body_wanted):
+        payload = self.server.payload
+        total = len(payload)
+        start, end, status = 0, total - 1, 200
+        byte_range = self.headers.get('Range', '')
+        if byte_range.startswith('bytes='):
+            first, _, last = byte_range[6:].split(',')[0].partition('-')
+            if first:
+                start = int(first)
+                end = min(int(last), total - 1) if last else total - 1
+            else:
+                start = max(0, total - int(last))
+            if start >= total:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{total}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            status = 206
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.send_response(status)
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', '"fixture"')
+        self.send_header('Content-Length', str(end - start + 1))
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{total}')
+        self.end_headers()
+        if body_wanted:
+            self._write_throttled(memoryview(payload)[start:end + 1])
+
+    def _write_throttled(self, body):
+        """Write `body`, at most `bandwidth` bytes/s when the server has a limit"""
+        bandwidth = self.server.bandwidth
+        if not bandwidth:
+            self.wfile.write(body)
+            return
+        began = time.monotonic()
+        for offset in range(0, len(body), THROTTLE_CHUNK):
+            self.wfile.write(body[offset:offset + THROTTLE_CHUNK])
+            ahead = (offset + THROTTLE_CHUNK) / bandwidth - (time.monotonic() - began)
+            if ahead > 0:
+                time.sleep(ahead)
+
+    def _page(self):
+        # Proxy-style requests carry an absolute URL (http://www.linkedin.com/...)
+        path = urlparse(self.path).path
+        for prefix, body in self.server.pages.items():
+            if path.startswith(prefix):
+                return body(path) if callable(body) else body
+        return None
+
+    def _send_page(self, body, body_wanted):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body_wanted:
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        page = self._page()
+        if page is not None:
+            return self._send_page(page, False)
+        self._send_video(False)
+
+    def do_GET(self):
+        page = self._page()
+        if page is not None:
+            return self._send_page(page, True)
+        self._send_video(True)
+
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients (yt-dlp probes, cancelled streams) often hang up early
+        if not isinstance(sys.exc_info()[1], (ConnectionError, TimeoutError)):
+            super().handle_error(request, client_address)
+
+
+class FixtureServer:
+    """
+    Threaded HTTP server on 127.0.0.1 serving a fixed video payload
+    `pages` maps path prefixes to HTML bodies (e.g. saved LinkedIn post pages)
+    or to callables building the body from the path; it also answers
+    plain-HTTP proxy requests, so clients can be pointed at
+    http://www.linkedin.com/... through it.
+    `latency` (seconds) delays every response, `bandwidth` (bytes/s) caps
+    each video transfer, to stand in for a remote CDN.
+    """
+
+    def __init__(self, size=1024 * 1024, pages=None, latency=0, bandwidth=None):
+        self.httpd = _QuietServer(('127.0.0.1', 0), _FixtureHandler)
+        self.httpd.payload = video_bytes(size)
+        self.httpd.pages = dict(pages or {})
+        self.httpd.latency = latency
+        self.httpd.bandwidth = bandwidth
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def url(self, path='/video.mp4'):
+        return self.base_url + path
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def load_page(name):
+    """Saved HTML page from benchmarks/pages"""
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pages', name), 'rb') as f:
+        return f.read()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _children(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def process_tree_cpu(pid):
+    """CPU seconds (user + system) used by a process and its children (Linux)"""
+    ticks = os.sysconf('SC_CLK_TCK')
+    total = 0.0
+    for proc in [pid] + _children(pid):
+        try:
+            with open(f'/proc/{proc}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        total += (int(fields[11]) + int(fields[12])) / ticks
+    return total
+
+
+def process_tree_rss(pid):
+    """Resident memory in bytes of a process and its children (Linux)"""
+    total = 0
+    for proc in [pid] + _children(pid):
+        try:
+            with open(f'/proc/{proc}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            continue
+    return total
+
+
+class GunicornServer:
+    """Run `gunicorn <app>` on a free local port for the duration of a benchmark"""
+
+    def __init__(self, app='app:app', workers=1, env=None, extra_args=()):
+        self.port = free_port()
+        self.cmd = [
+            sys.executable, '-m', 'gunicorn', app,
+            '--bind', f'127.0.0.1:{self.port}',
+            '--workers', str(workers),
+            '--timeout', '120',
+            *extra_args,
+        ]
+        self.env = dict(os.environ, **(env or {}))
+        self.proc = None
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.port}'
+
+    def cpu_seconds(self):
+        return process_tree_cpu(self.proc.pid)
+
+    def rss_bytes(self):
+        return process_tree_rss(self.proc.pid)
+
+    def __enter__(self):
+        self.proc = subprocess.Popen(
+            self.cmd, cwd=ROOT, env=self.env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            try:
+                urlopen(self.base_url + '/api/stats', timeout=1).read()
+                return self
+            except OSError:
+                time.sleep(0.1)
+        self.proc.kill()
+        raise RuntimeError('gunicorn did not start')
+
+    def __exit__(self, *exc):
+        self.proc.terminate()
+        try:
+            self.proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
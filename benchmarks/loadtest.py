@@ -0,0 +1,337 @@
+"""
+Load test: the apps under gunicorn against a local LinkedIn/CDN stand-in
+
+Starts a fake LinkedIn post server and a fake CDN (deterministic video bytes
+with configurable latency and bandwidth), puts the stub yt-dlp module and
+command (benchmarks/stub) in front of the real one, and drives each app at a
+fixed concurrency:
+  extract   POST /api/extract over --posts distinct posts (first hit per
+            post extracts, the rest are cache hits)
+  proxy     GET /api/download-proxy of a CDN video, body read to the end
+  download  POST /api/download, poll the job, then GET its file (app.py only)
+
+Reports p50/p95/p99 latency, throughput, server CPU and peak RSS (gunicorn
+master + workers) and writes them as JSON. --compare checks a run against an
+earlier results file and exits 1 on a p95 or throughput regression.
+
+The page fast path is off (FAST_EXTRACT=false) because it fetches
+linkedin.com over HTTPS directly; bench_page_extract.py covers it.
+
+Usage:
+    python benchmarks/loadtest.py [--app app|vercel|both] [--requests 200]
+        [--concurrency 16] [--video-mb 4] [--cdn-latency 0.05]
+        [--cdn-bandwidth-mb 50] [--ytdlp module|cli]
+        [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import requests
+
+from fixtures import ROOT, FixtureServer, GunicornServer
+
+STUB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stub')
+
+APPS = {
+    'app': ('app:app', ('extract', 'proxy', 'download')),
+    # No /api/download on Vercel
+    'vercel': ('app_vercel:app', ('extract', 'proxy')),
+}
+
+# Renditions listed in each fake post page
+RENDITIONS = ((360, 450000), (720, 2300000))
+
+
+def post_page(cdn_url):
+    """Page builder for the fake LinkedIn server: one video per post ID"""
+    def build(path):
+        post_id = ''.join(c for c in path if c.isdigit())[-19:] or '0'
+        sources = [
+            {'src': f'{cdn_url}/video/{post_id}/mp4-{height}p.mp4', 'type': 'video/mp4', 'data-bitrate': bitrate}
+            for height, bitrate in RENDITIONS
+        ]
+        data_sources = json.dumps(sources).replace('"', '&quot;')
+        return (
+            '<!DOCTYPE html><html><head>'
+            f'<title>Post {post_id} | LinkedIn</title>'
+            f'<meta property="og:title" content="Load test post {post_id}">'
+            f'<meta property="og:image" content="{cdn_url}/image/{post_id}.jpg">'
+            '</head><body>'
+            f'<video class="share-native-video__node" data-sources="{data_sources}"></video>'
+            '</body></html>'
+        ).encode()
+    return build
+
+
+class RssSampler:
+    """Peak resident memory of the server's process tree, sampled in the background"""
+
+    def __init__(self, server, interval=0.1):
+        self.server = server
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.server.rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.server.rss_bytes())
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_scenario(server, task, requests_total, concurrency):
+    """Call task(session, i) requests_total times from `concurrency` threads"""
+    local = threading.local()
+    latencies = []
+    errors = []
+    transferred = []
+
+    def one(i):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            transferred.append(task(session, i))
+            latencies.append(time.perf_counter() - start)
+        except Exception as e:
+            errors.append(str(e))
+
+    cpu_start = server.cpu_seconds()
+    with RssSampler(server) as rss:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one, range(requests_total)))
+        elapsed = time.perf_counter() - start
+    cpu = server.cpu_seconds() - cpu_start
+
+    result = {
+        'requests': requests_total,
+        'concurrency': concurrency,
+        'errors': len(errors),
+        'duration_s': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 2),
+        'mb_per_s': round(sum(transferred) / elapsed / 1e6, 2),
+        'server_cpu_s': round(cpu, 3),
+        'cpu_per_request_ms': round(cpu / requests_total * 1000, 3),
+        'peak_rss_mb': round(rss.peak / 1e6, 1),
+    }
+    if latencies:
+        result['latency_ms'] = {
+            'p50': round(percentile(latencies, 0.50) * 1000, 2),
+            'p95': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99': round(percentile(latencies, 0.99) * 1000, 2),
+            'mean': round(statistics.mean(latencies) * 1000, 2),
+            'max': round(max(latencies) * 1000, 2),
+        }
+    if errors:
+        result['first_error'] = errors[0][:300]
+    return result
+
+
+def post_url(run_id, i):
+    # IDs are unique per run so the disk and metadata caches start cold
+    return f'https://www.linkedin.com/feed/update/urn:li:activity:{run_id + i}/'
+
+
+def extract_task(server, run_id, posts):
+    def task(session, i):
+        response = session.post(server.base_url + '/api/extract', json={'url': post_url(run_id, i % posts)}, timeout=60)
+        response.raise_for_status()
+        return len(response.content)
+    return task
+
+
+def proxy_task(server, cdn):
+    def task(session, i):
+        video_url = f'{cdn.base_url}/video/{i}/mp4-720p.mp4'
+        received = 0
+        with session.get(
+            f'{server.base_url}/api/download-proxy?url={quote(video_url, safe="")}',
+            stream=True, timeout=120
+        ) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=1024 * 1024):
+                received += len(chunk)
+        return received
+    return task
+
+
+def download_task(server, run_id):
+    # Offset so these posts weren't extracted by the extract scenario
+    offset = 10 ** 6
+
+    def task(session, i):
+        response = session.post(server.base_url + '/api/download', json={'url': post_url(run_id, offset + i)}, timeout=60)
+        response.raise_for_status()
+        status = response.json()
+        deadline = time.monotonic() + 120
+        while status['status'] not in ('done', 'failed'):
+            if time.monotonic() > deadline:
+                raise TimeoutError('download job did not finish')
+            time.sleep(0.05)
+            status = session.get(server.base_url + f'/api/download/{status["job_id"]}', timeout=10).json()
+        if status['status'] == 'failed':
+            raise RuntimeError(status['error'])
+        with session.get(server.base_url + status['file_url'], stream=True, timeout=120) as response:
+            response.raise_for_status()
+            return sum(len(chunk) for chunk in response.iter_content(chunk_size=1024 * 1024))
+    return task
+
+
+def run_app(name, args, linkedin, cdn, run_id):
+    module, scenarios = APPS[name]
+    env = {
+        'PYTHONPATH': os.pathsep.join([STUB_DIR, ROOT, os.environ.get('PYTHONPATH', '')]),
+        'PATH': os.pathsep.join([os.path.join(STUB_DIR, 'bin'), os.environ.get('PATH', '')]),
+        'STUB_LINKEDIN_URL': linkedin.base_url,
+        'STUB_EXTRACT_DELAY': str(args.extract_delay),
+        'STUB_YT_DLP_MODE': args.ytdlp,
+        'FAST_EXTRACT': 'false',
+        # Every simulated user shares 127.0.0.1
+        'RATE_LIMIT_PER_MINUTE': '0',
+        'CACHE_DB_PATH': os.path.join(args.workdir, f'{name}-cache.sqlite3'),
+    }
+    extra_args = ['--threads', str(args.threads)] if args.threads > 1 else []
+    results = {}
+    with GunicornServer(module, workers=args.workers, env=env, extra_args=extra_args) as server:
+        tasks = {
+            'extract': extract_task(server, run_id, args.posts),
+            'proxy': proxy_task(server, cdn),
+            'download': download_task(server, run_id),
+        }
+        for scenario in scenarios:
+            if scenario not in args.scenarios:
+                continue
+            requests_total = args.requests if scenario == 'extract' else args.transfers
+            results[scenario] = run_scenario(server, tasks[scenario], requests_total, args.concurrency)
+            print_result(name, scenario, results[scenario])
+    return results
+
+
+def print_result(app, scenario, result):
+    latency = result.get('latency_ms', {})
+    print(
+        f'{app:<7} {scenario:<9} '
+        f'p50 {latency.get("p50", 0):8.1f} ms  p95 {latency.get("p95", 0):8.1f} ms  '
+        f'p99 {latency.get("p99", 0):8.1f} ms  {result["throughput_rps"]:8.1f} req/s  '
+        f'{result["mb_per_s"]:7.1f} MB/s  cpu/req {result["cpu_per_request_ms"]:7.2f} ms  '
+        f'rss {result["peak_rss_mb"]:6.1f} MB  errors {result["errors"]}'
+    )
+    if result.get('first_error'):
+        print(f'        first error: {result["first_error"]}')
+
+
+def compare(results, baseline, tolerance):
+    """Print changes vs a baseline run; True if something regressed beyond tolerance"""
+    regressed = False
+    for app, scenarios in results.items():
+        for scenario, result in scenarios.items():
+            before = baseline.get('results', {}).get(app, {}).get(scenario)
+            if not before or 'latency_ms' not in before or 'latency_ms' not in result:
+                continue
+            p95_change = result['latency_ms']['p95'] / before['latency_ms']['p95'] - 1
+            rps_change = result['throughput_rps'] / before['throughput_rps'] - 1 if before['throughput_rps'] else 0.0
+            bad = p95_change > tolerance or rps_change < -tolerance
+            regressed |= bad
+            print(
+                f'{app:<7} {scenario:<9} p95 {p95_change * 100:+6.1f}%  '
+                f'throughput {rps_change * 100:+6.1f}%{"  REGRESSION" if bad else ""}'
+            )
+    return regressed
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--app', choices=('app', 'vercel', 'both'), default='both')
+    parser.add_argument('--scenarios', default='extract,proxy,download')
+    parser.add_argument('--requests', type=int, default=200, help='extract requests')
+    parser.add_argument('--transfers', type=int, default=32, help='proxy / download requests')
+    parser.add_argument('--posts', type=int, default=20, help='distinct posts in the extract scenario')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker')
+    parser.add_argument('--video-mb', type=float, default=4)
+    parser.add_argument('--cdn-latency', type=float, default=0.05, help='seconds before each CDN response')
+    parser.add_argument('--cdn-bandwidth-mb', type=float, default=0, help='MB/s per CDN transfer (0: unlimited)')
+    parser.add_argument('--page-latency', type=float, default=0.2, help='seconds before each post page')
+    parser.add_argument('--extract-delay', type=float, default=0.0, help='extra stub yt-dlp time per extraction')
+    parser.add_argument('--ytdlp', choices=('module', 'cli'), default='module')
+    parser.add_argument('--output', help='write results as JSON')
+    parser.add_argument('--compare', help='earlier --output file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10)
+    args = parser.parse_args()
+    args.scenarios = set(args.scenarios.split(','))
+
+    apps = ('app', 'vercel') if args.app == 'both' else (args.app,)
+    run_id = 7 * 10 ** 18 + (time.time_ns() // 1000) % 10 ** 12 * 1000
+    bandwidth = args.cdn_bandwidth_mb * 1e6 or None
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        args.workdir = workdir
+        with FixtureServer(size=int(args.video_mb * 1024 * 1024), latency=args.cdn_latency,
+                           bandwidth=bandwidth) as cdn:
+            page = post_page(cdn.base_url)
+            with FixtureServer(pages={'/feed/update/': page, '/posts/': page}, latency=args.page_latency) as linkedin:
+                for name in apps:
+                    results[name] = run_app(name, args, linkedin, cdn, run_id)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'args': {k: (sorted(v) if isinstance(v, set) else v) for k, v in vars(args).items() if k != 'workdir'},
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'results written to {args.output}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+"""
+Stand-in for yt-dlp used by the load test
+Implements the parts of the YoutubeDL API and command line the apps use, so
+extraction and downloads run against the local fake LinkedIn and CDN
+servers instead of linkedin.com:
+  STUB_LINKEDIN_URL    fake LinkedIn base URL; post pages are fetched from
+                       it with the path of the real URL
+  STUB_EXTRACT_DELAY   extra seconds per extraction (yt-dlp's own CPU time)
+
+Post pages are parsed the way yt-dlp's LinkedIn extractor does it: the
+<video data-sources> JSON becomes the formats list.
+"""
+import html
+import json
+import os
+import re
+import sys
+import time
+from urllib.parse import urlparse
+from urllib.request import urlopen
+
+_VIDEO_RE = re.compile(r'<video[^>]+data-sources="([^"]*)"')
+_TITLE_RE = re.compile(r'<meta property="og:title" content="([^"]*)"')
+_IMAGE_RE = re.compile(r'<meta property="og:image" content="([^"]*)"')
+_ACTIVITY_RE = re.compile(r'urn:li:activity:(\d+)|-activity-(\d+)')
+# The --print templates the apps use: %(.{a,b}|null)j and %(formats.:.{a,b}|null)j
+_TEMPLATE_RE = re.compile(r'%\((\w*)(?:\.:)?\.\{([\w,]+)\}(?:\|null)?\)j')
+
+
+class DownloadError(Exception):
+    pass
+
+
+class LinkedInIE:
+    IE_NAME = 'linkedin'
+    _VALID_URL = re.compile(r'https?://(?:www\.)?linkedin\.com/(?:posts|feed/update)/')
+
+    @classmethod
+    def suitable(cls, url):
+        return bool(cls._VALID_URL.match(url))
+
+
+class LinkedInEventsIE(LinkedInIE):
+    IE_NAME = 'linkedin:events'
+    _VALID_URL = re.compile(r'https?://(?:www\.)?linkedin\.com/events/')
+
+
+def _page_url(url):
+    """The fake LinkedIn server's URL for a linkedin.com URL"""
+    base = os.environ.get('STUB_LINKEDIN_URL')
+    if not base:
+        raise DownloadError('STUB_LINKEDIN_URL is not set')
+    parsed = urlparse(url)
+    return base.rstrip('/') + parsed.path + (f'?{parsed.query}' if parsed.query else '')
+
+
+def extract(url):
+    """Info dict for a post URL, in the shape yt-dlp returns"""
+    delay = float(os.environ.get('STUB_EXTRACT_DELAY', 0))
+    if delay:
+        time.sleep(delay)
+    try:
+        with urlopen(_page_url(url), timeout=30) as response:
+            page = response.read().decode('utf-8', 'replace')
+    except OSError as e:
+        raise DownloadError(f'ERROR: Unable to download webpage: {e}')
+    match = _VIDEO_RE.search(page)
+    if match is None:
+        raise DownloadError('ERROR: [linkedin] Unable to extract video')
+    sources = json.loads(html.unescape(match.group(1)))
+    formats = [{
+        'format_id': str(index),
+        'url': source['src'],
+        'ext': 'mp4',
+        'tbr': source.get('data-bitrate', 0) / 1000,
+        'protocol': 'http',
+    } for index, source in enumerate(sorted(sources, key=lambda s: s.get('data-bitrate', 0)))]
+    post = _ACTIVITY_RE.search(url)
+    title = _TITLE_RE.search(page)
+    image = _IMAGE_RE.search(page)
+    return {
+        'id': (post.group(1) or post.group(2)) if post else 'video',
+        'title': html.unescape(title.group(1)) if title else None,
+        'thumbnail': html.unescape(image.group(1)) if image else None,
+        'formats': formats,
+        # What format 'best[ext=mp4]/best' resolves to
+        'url': formats[-1]['url'],
+        'ext': 'mp4',
+    }
+
+
+def download(url, path, progress_hooks=()):
+    """Fetch a post's best format (or a direct video URL) to `path`"""
+    video_url = extract(url)['url'] if LinkedInIE.suitable(url) else url
+    try:
+        with urlopen(video_url, timeout=60) as response, open(path, 'wb') as f:
+            total = int(response.headers.get('Content-Length') or 0)
+            done = 0
+            while True:
+                chunk = response.read(1024 * 1024)
+                if not chunk:
+                    break
+                f.write(chunk)
+                done += len(chunk)
+                for hook in progress_hooks:
+                    hook({'status': 'downloading', 'downloaded_bytes': done, 'total_bytes': total})
+    except OSError as e:
+        raise DownloadError(f'ERROR: Unable to download video: {e}')
+    for hook in progress_hooks:
+        hook({'status': 'finished', 'downloaded_bytes': done, 'total_bytes': total, 'filename': path})
+
+
+class YoutubeDL:
+    """The subset of yt_dlp.YoutubeDL the apps call"""
+
+    def __init__(self, params=None, auto_init=True):
+        self.params = dict(params or {})
+        self._ies = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+    def add_info_extractor(self, ie):
+        self._ies[ie.IE_NAME] = ie
+
+    def get_info_extractor(self, name):
+        return self._ies.setdefault(name, LinkedInIE())
+
+    def extract_info(self, url, download=True):
+        info = extract(url)
+        if download:
+            self.download([url])
+        return info
+
+    def download(self, urls):
+        template = self.params.get('outtmpl') or '%(id)s.%(ext)s'
+        for url in urls:
+            path = template.replace('%(ext)s', 'mp4').replace('%(id)s', 'video')
+            download(url, path, self.params.get('progress_hooks') or ())
+        return 0
+
+
+def render(template, info):
+    """Evaluate a --print template (the object-traversal subset the apps use)"""
+    def field(match):
+        source, keys = match.group(1), match.group(2).split(',')
+
+        def pick(obj):
+            return {key: obj[key] for key in keys if obj.get(key) is not None}
+        if source:
+            return json.dumps([pick(item) for item in info.get(source) or []])
+        return json.dumps(pick(info))
+    return _TEMPLATE_RE.sub(field, template)
+
+
+def main(argv):
+    """`yt-dlp` command line: --dump-json, --print, or download to --output"""
+    output, dump_json, prints, urls = '%(id)s.%(ext)s', False, [], []
+    args = iter(argv)
+    for arg in args:
+        if arg in ('--format', '-f'):
+            next(args)
+        elif arg in ('--output', '-o'):
+            output = next(args)
+        elif arg in ('--dump-json', '-j'):
+            dump_json = True
+        elif arg in ('--print', '-O'):
+            prints.append(next(args))
+        elif not arg.startswith('-'):
+            urls.append(arg)
+    try:
+        for url in urls:
+            if prints:
+                info = extract(url)
+                for template in prints:
+                    print(render(template, info))
+            elif dump_json:
+                print(json.dumps(extract(url)))
+            else:
+                YoutubeDL({'outtmpl': output}).download([url])
+    except DownloadError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    return 0
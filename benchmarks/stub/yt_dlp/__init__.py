@@ -0,0 +1,12 @@
+"""
+Load-test stand-in for the yt_dlp package (see benchmarks/stub/stub_ytdlp.py)
+With STUB_YT_DLP_MODE=cli the import fails, as when yt-dlp was installed
+with brew, so the apps fall back to the `yt-dlp` command (benchmarks/stub/bin)
+"""
+import os
+
+if os.environ.get('STUB_YT_DLP_MODE') == 'cli':
+    raise ImportError('yt_dlp disabled by STUB_YT_DLP_MODE=cli')
+
+from stub_ytdlp import YoutubeDL  # noqa: E402,F401
+from yt_dlp import utils  # noqa: E402,F401
@@ -0,0 +1 @@
+from stub_ytdlp import LinkedInEventsIE, LinkedInIE  # noqa: F401
@@ -0,0 +1 @@
+from stub_ytdlp import DownloadError  # noqa: F401
@@ -0,0 +1,228 @@
+"""
+Content-addressed on-disk cache for downloaded videos
+Files are stored as <directory>/<key><ext>, where key identifies the video
+(not its title), and written through a temp file + atomic rename.
+
+An in-memory index (path -> size, last access) is built with one os.scandir
+pass and then kept up to date as files are added, hit and evicted; the
+directory is only rescanned when its mtime shows outside changes. Eviction
+runs from a background scheduler (see maintain()), not on user requests.
+"""
+import os
+import re
+import shutil
+import time
+import uuid
+from threading import Lock
+
+VIDEO_EXTS = ('.mp4', '.webm', '.m4a', '.mkv')
+
+# Temp files of downloads that died mid-way are removed after this long
+STALE_TEMP_AGE = 3600
+
+_KEY_RE = re.compile(r'^[A-Za-z0-9_-]+$')
+TEMP_PREFIX = '.tmp-'
+
+
+class DiskCache:
+    """Size-, age- and disk-usage-bounded LRU cache of video (or other) files"""
+
+    def __init__(self, directory, max_bytes=2 * 1024 ** 3, max_age=3600,
+                 high_water=0.90, low_water=0.80, exts=VIDEO_EXTS):
+        self.directory = directory
+        # File extensions this cache stores (and recognizes when scanning)
+        self.exts = exts
+        self.max_bytes = max_bytes
+        # Files not accessed for this long are removed
+        self.max_age = max_age
+        # Fractions of the filesystem: start evicting above high_water and
+        # continue until usage is back under low_water
+        self.high_water = high_water
+        self.low_water = low_water
+        self._index = {}  # path -> [size, last_access]
+        self._bytes = 0
+        self._dir_mtime = None
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.scans = 0
+
+    def _check_key(self, key):
+        if not _KEY_RE.match(key):
+            raise ValueError(f'Invalid cache key: {key!r}')
+
+    def _ensure_dir(self):
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _index_add(self, path, size, last_access):
+        with self._lock:
+            old = self._index.get(path)
+            if old is not None:
+                self._bytes -= old[0]
+            self._index[path] = [size, last_access]
+            self._bytes += size
+
+    def _index_remove(self, path):
+        with self._lock:
+            entry = self._index.pop(path, None)
+            if entry is not None:
+                self._bytes -= entry[0]
+
+    def get(self, key):
+        """Return the cached file path for `key`, or None"""
+        self._check_key(key)
+        now = time.time()
+        for ext in self.exts:
+            path = os.path.join(self.directory, key + ext)
+            try:
+                # Persist recency in mtime so LRU order survives restarts
+                os.utime(path, (now, now))
+            except OSError:
+                continue
+            with self._lock:
+                entry = self._index.get(path)
+                if entry is not None:
+                    entry[1] = now
+            if entry is None:
+                self._index_add(path, os.path.getsize(path), now)
+            self.hits += 1
+            return path
+        self.misses += 1
+        return None
+
+    def temp_path(self, key):
+        """Unique path prefix (no extension) for an in-progress download"""
+        self._check_key(key)
+        self._ensure_dir()
+        return os.path.join(self.directory, f'{TEMP_PREFIX}{key}-{uuid.uuid4().hex}')
+
+    def in_progress(self, key):
+        """True if a download for `key` is currently being written"""
+        self._check_key(key)
+        prefix = f'{TEMP_PREFIX}{key}-'
+        try:
+            with os.scandir(self.directory) as it:
+                return any(entry.name.startswith(prefix) for entry in it)
+        except OSError:
+            return False
+
+    def discard(self, temp_base):
+        """Remove whatever a failed download left under a temp_path() prefix"""
+        prefix = os.path.basename(temp_base)
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.startswith(prefix):
+                        _remove(entry.path)
+        except OSError:
+            pass
+
+    def commit(self, key, temp_file):
+        """Atomically move a finished download into place and return its path"""
+        self._check_key(key)
+        ext = os.path.splitext(temp_file)[1] or self.exts[0]
+        path = os.path.join(self.directory, key + ext)
+        os.replace(temp_file, path)
+        self._index_add(path, os.path.getsize(path), time.time())
+        return path
+
+    def over_budget(self):
+        return self._bytes > self.max_bytes
+
+    def _scan_if_changed(self):
+        """
+        Rebuild the index with os.scandir if the directory changed behind our
+        back (first run, another worker, manual deletion); no-op otherwise
+        """
+        try:
+            dir_mtime = os.stat(self.directory).st_mtime_ns
+        except OSError:
+            return
+        if dir_mtime == self._dir_mtime:
+            return
+        index = {}
+        total = 0
+        now = time.time()
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                try:
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                if entry.name.startswith(TEMP_PREFIX):
+                    if now - stat.st_mtime > STALE_TEMP_AGE:
+                        _remove(entry.path)
+                    continue
+                name, ext = os.path.splitext(entry.name)
+                if ext in self.exts and _KEY_RE.match(name):
+                    index[entry.path] = [stat.st_size, stat.st_mtime]
+                    total += stat.st_size
+        with self._lock:
+            # Keep fresher in-memory access times for files we already know
+            for path, entry in index.items():
+                known = self._index.get(path)
+                if known is not None:
+                    entry[1] = max(entry[1], known[1])
+            self._index = index
+            self._bytes = total
+        self._dir_mtime = dir_mtime
+        self.scans += 1
+
+    def _bytes_to_free(self):
+        """Bytes to evict to get under max_bytes and the disk low-water mark"""
+        excess = self._bytes - self.max_bytes
+        try:
+            usage = shutil.disk_usage(self.directory)
+        except OSError:
+            return max(0, excess)
+        if usage.used > usage.total * self.high_water:
+            excess = max(excess, usage.used - int(usage.total * self.low_water))
+        return max(0, excess)
+
+    def maintain(self):
+        """Evict expired files, then least recently used ones until within budget"""
+        if not os.path.isdir(self.directory):
+            return
+        self._scan_if_changed()
+        now = time.time()
+        with self._lock:
+            by_age = sorted(self._index.items(), key=lambda item: item[1][1])
+        to_free = self._bytes_to_free()
+        for path, (size, last_access) in by_age:
+            expired = self.max_age and now - last_access > self.max_age
+            if not expired and to_free <= 0:
+                break
+            if _remove(path) or not os.path.exists(path):
+                self._index_remove(path)
+                to_free -= size
+                self.evictions += 1
+        # Our own deletions changed the directory mtime; don't rescan for them
+        try:
+            self._dir_mtime = os.stat(self.directory).st_mtime_ns
+        except OSError:
+            pass
+
+    def stats(self):
+        with self._lock:
+            files = len(self._index)
+            total = self._bytes
+        return {
+            'files': files,
+            'bytes': total,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'scans': self.scans,
+        }
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+        return True
+    except OSError:
+        return False
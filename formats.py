@@ -0,0 +1,117 @@
+"""
+Video format lists and selection
+yt-dlp already lists every rendition of a post in info['formats']. A compact
+projection of it (id, resolution, bitrate, size, URL) is cached with the
+metadata, so clients can ask for a cheaper rendition than the best one and
+the server can pick one by policy when they don't.
+
+Selectors:
+  best      highest bitrate, MP4 preferred ('best[ext=mp4]/best')
+  worst     lowest bitrate, MP4 preferred
+  preview   cheapest format at least PREVIEW_MIN_HEIGHT pixels high
+  <N>p      best format no taller than N pixels, e.g. 480p
+  <id>      a format_id listed by /api/extract
+"""
+import re
+
+BEST = 'best'
+WORST = 'worst'
+PREVIEW = 'preview'
+
+# Smallest height that still looks fine in the inline player
+PREVIEW_MIN_HEIGHT = 360
+
+# Only single-file formats can be proxied or served from disk
+_STREAMING_PROTOCOLS = ('m3u8', 'm3u8_native', 'http_dash_segments', 'f4m', 'ism')
+# LinkedIn CDN URLs and format IDs carry the rendition: .../mp4-720p-30fp-crf28/...
+_HEIGHT_RE = re.compile(r'(?<![0-9])(\d{3,4})p(?![a-z])')
+_MAX_HEIGHT_RE = re.compile(r'^(\d{3,4})p$')
+
+# Per-format fields compact_formats reads
+FORMAT_FIELDS = ('format_id', 'url', 'ext', 'width', 'height', 'tbr', 'filesize', 'filesize_approx', 'vcodec', 'protocol')
+
+
+def _number(value):
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _height(fmt):
+    height = _number(fmt.get('height'))
+    if height:
+        return int(height)
+    for text in (fmt.get('format_id'), fmt.get('url')):
+        match = _HEIGHT_RE.search(text or '')
+        if match:
+            return int(match.group(1))
+    return None
+
+
+def compact_formats(info):
+    """
+    Project info['formats'] down to what clients need to choose a rendition
+    Returns format_id/ext/width/height/tbr/filesize/url dicts, cheapest first
+    """
+    formats = []
+    seen = set()
+    for index, fmt in enumerate(info.get('formats') or []):
+        if not isinstance(fmt, dict) or not fmt.get('url'):
+            continue
+        if fmt.get('vcodec') == 'none' or fmt.get('protocol') in _STREAMING_PROTOCOLS:
+            continue
+        ext = fmt.get('ext') or 'mp4'
+        height = _height(fmt)
+        format_id = fmt.get('format_id') or str(index)
+        # yt-dlp numbers unnamed formats by sort order; a name is stable across runs
+        if format_id.isdigit() and height:
+            format_id = f'{ext}-{height}p'
+        if format_id in seen:
+            format_id = f'{format_id}-{index}'
+        seen.add(format_id)
+        tbr = _number(fmt.get('tbr'))
+        formats.append({
+            'format_id': format_id,
+            'ext': ext,
+            'width': int(fmt['width']) if _number(fmt.get('width')) else None,
+            'height': height,
+            'tbr': round(tbr) if tbr else None,
+            'filesize': int(fmt.get('filesize') or fmt.get('filesize_approx') or 0),
+            'url': fmt['url'],
+        })
+    formats.sort(key=_quality)
+    return formats
+
+
+def _quality(fmt):
+    return (fmt.get('tbr') or 0, fmt.get('height') or 0, fmt.get('filesize') or 0)
+
+
+def _preferred(formats):
+    """MP4 formats if there are any (browsers play them everywhere)"""
+    mp4 = [f for f in formats if f.get('ext') == 'mp4']
+    return mp4 or list(formats)
+
+
+def select_format(formats, selector, min_height=PREVIEW_MIN_HEIGHT):
+    """Format dict matching `selector`, or None if there is no match"""
+    if not formats:
+        return None
+    selector = (selector or BEST).strip()
+    pool = _preferred(formats)
+    if selector == BEST:
+        return max(pool, key=_quality)
+    if selector == WORST:
+        return min(pool, key=_quality)
+    if selector == PREVIEW:
+        # Unknown heights count as adequate; otherwise settle for the tallest
+        adequate = [f for f in pool if not f.get('height') or f['height'] >= min_height]
+        return min(adequate, key=_quality) if adequate else max(pool, key=_quality)
+    match = _MAX_HEIGHT_RE.match(selector)
+    if match:
+        limit = int(match.group(1))
+        fitting = [f for f in pool if f.get('height') and f['height'] <= limit]
+        return max(fitting, key=_quality) if fitting else min(pool, key=_quality)
+    return next((f for f in formats if f['format_id'] == selector), None)
+
@@ -0,0 +1,121 @@
+"""
+Shared keep-alive HTTP session for talking to the LinkedIn CDN
+Reusing connections saves a TCP + TLS handshake per proxied download and per
+size probe. requests/urllib3 connection pools are thread-safe.
+"""
+import os
+from threading import Lock
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Optional: async client for the ASGI serving mode
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+# Hosts serving LinkedIn video and images get a larger dedicated pool
+CDN_HOSTS = ('dms.licdn.com', 'media.licdn.com', 'static.licdn.com')
+
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 16))
+HTTP_CDN_POOL_MAXSIZE = int(os.getenv('HTTP_CDN_POOL_MAXSIZE', 32))
+HTTP_RETRIES = int(os.getenv('HTTP_RETRIES', 2))
+
+_session = None
+_session_lock = Lock()
+_async_client = None
+
+
+def _make_adapter(maxsize):
+    retries = Retry(
+        total=HTTP_RETRIES,
+        backoff_factor=0.3,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['HEAD', 'GET']),
+        raise_on_status=False,
+    )
+    # pool_block=False: overflow connections are opened (and discarded)
+    # rather than making requests wait for a free one
+    return HTTPAdapter(pool_connections=8, pool_maxsize=maxsize, max_retries=retries)
+
+
+def create_session():
+    """Build a session with per-host pools, keep-alive and retry with backoff"""
+    session = requests.Session()
+    session.headers['User-Agent'] = USER_AGENT
+    session.mount('http://', _make_adapter(HTTP_POOL_MAXSIZE))
+    session.mount('https://', _make_adapter(HTTP_POOL_MAXSIZE))
+    for host in CDN_HOSTS:
+        session.mount(f'https://{host}/', _make_adapter(HTTP_CDN_POOL_MAXSIZE))
+    return session
+
+
+def get_session():
+    """Process-wide shared session, created on first use"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def get_async_client():
+    """
+    Process-wide httpx.AsyncClient with keep-alive, connect retries and the
+    same User-Agent as the sync session
+    Must be used from a single event loop (one per ASGI worker process)
+    """
+    global _async_client
+    if _async_client is None:
+        transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=None,
+                max_keepalive_connections=HTTP_CDN_POOL_MAXSIZE,
+            ),
+            retries=HTTP_RETRIES,
+        )
+        _async_client = httpx.AsyncClient(
+            headers={'User-Agent': USER_AGENT},
+            timeout=httpx.Timeout(30.0),
+            follow_redirects=True,
+            transport=transport,
+        )
+    return _async_client
+
+
+def connection_stats(session=None):
+    """
+    Connection reuse counters from the underlying urllib3 pools
+    `reused` requests went out over an existing keep-alive connection
+    """
+    session = session or _session
+    hosts = {}
+    if session is None:
+        return {'connections': 0, 'requests': 0, 'reused': 0, 'hosts': hosts}
+    seen = set()
+    for adapter in session.adapters.values():
+        if id(adapter) in seen:
+            continue
+        seen.add(id(adapter))
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = hosts.setdefault(pool.host, {'connections': 0, 'requests': 0})
+            host['connections'] += pool.num_connections
+            host['requests'] += pool.num_requests
+    connections = sum(h['connections'] for h in hosts.values())
+    total = sum(h['requests'] for h in hosts.values())
+    return {
+        'connections': connections,
+        'requests': total,
+        'reused': max(0, total - connections),
+        'hosts': hosts,
+    }
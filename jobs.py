@@ -0,0 +1,183 @@
+"""
+Background download jobs
+POST /api/download enqueues a job and returns immediately; a bounded worker
+pool runs the downloads and clients poll the job for progress, then fetch
+the finished file. Jobs are keyed by video, so identical requests attach to
+the same job instead of downloading twice.
+
+Large /api/extract/batch and /api/admin/prefetch requests run the same way
+(BatchJob), so they don't outlive gunicorn's request timeout.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class QueueFull(Exception):
+    """Raised when too many jobs are already waiting"""
+
+
+class DownloadJob:
+    """State of one download, updated from yt-dlp progress hooks"""
+    __slots__ = (
+        'id', 'url', 'format', 'status', 'downloaded_bytes', 'total_bytes',
+        'error', 'file', 'created', 'finished'
+    )
+
+    def __init__(self, job_id, url, fmt=None):
+        self.id = job_id
+        self.url = url
+        # Rendition to download (a formats.compact_formats entry), None for the best
+        self.format = fmt
+        self.status = QUEUED
+        self.downloaded_bytes = 0
+        self.total_bytes = 0
+        self.error = None
+        self.file = None
+        self.created = time.time()
+        self.finished = None
+
+    @property
+    def active(self):
+        return self.status in (QUEUED, RUNNING)
+
+    @property
+    def progress(self):
+        if self.status == DONE:
+            return 1.0
+        if self.total_bytes:
+            return min(1.0, self.downloaded_bytes / self.total_bytes)
+        return 0.0
+
+    def progress_hook(self, d):
+        """yt-dlp progress hook"""
+        if d.get('status') == 'downloading':
+            self.downloaded_bytes = d.get('downloaded_bytes') or 0
+            self.total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'format': self.format['format_id'] if self.format else None,
+            'progress': round(self.progress, 3),
+            'downloaded_bytes': self.downloaded_bytes,
+            'total_bytes': self.total_bytes,
+            'error': self.error,
+        }
+
+
+class BatchJob:
+    """State of one background batch: `lines` yields its NDJSON result lines"""
+    __slots__ = ('id', 'lines', 'total', 'completed', 'status', 'error', 'file', 'created', 'finished')
+
+    def __init__(self, job_id, lines, total):
+        self.id = job_id
+        self.lines = lines
+        self.total = total
+        self.completed = 0
+        self.status = QUEUED
+        self.error = None
+        self.file = None
+        self.created = time.time()
+        self.finished = None
+
+    @property
+    def active(self):
+        return self.status in (QUEUED, RUNNING)
+
+    @property
+    def progress(self):
+        if self.status == DONE:
+            return 1.0
+        return min(1.0, self.completed / self.total) if self.total else 0.0
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'progress': round(self.progress, 3),
+            'completed': self.completed,
+            'total': self.total,
+            'error': self.error,
+        }
+
+
+class JobQueue:
+    """
+    Bounded pool of download workers
+    run(job) performs the download and returns (path, error); submit()'s
+    arguments after the job ID are passed to job_class
+    """
+
+    def __init__(self, run, workers=2, max_queued=100, ttl=3600, job_class=DownloadJob):
+        self.run = run
+        self.job_class = job_class
+        self.workers = workers
+        self.max_queued = max_queued
+        # Finished jobs are forgotten after this long (the file may outlive them)
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = Lock()
+        self._executor = None
+        self.submitted = 0
+        self.deduplicated = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='download')
+        return self._executor
+
+    def _prune(self):
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished and now - job.finished > self.ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def submit(self, job_id, *args):
+        """Return the existing job for `job_id` or enqueue a new one"""
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(job_id)
+            # Reuse active and successful jobs; failed ones are retried
+            if job is not None and job.status != FAILED:
+                self.deduplicated += 1
+                return job
+            queued = sum(1 for j in self._jobs.values() if j.status == QUEUED)
+            if queued >= self.max_queued:
+                raise QueueFull()
+            job = self.job_class(job_id, *args)
+            self._jobs[job_id] = job
+            self.submitted += 1
+        self._get_executor().submit(self._execute, job)
+        return job
+
+    def _execute(self, job):
+        job.status = RUNNING
+        try:
+            path, error = self.run(job)
+        except Exception as e:
+            path, error = None, str(e)
+        job.file = path
+        job.error = error
+        job.finished = time.time()
+        job.status = FAILED if error else DONE
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        return dict(counts, workers=self.workers, submitted=self.submitted, deduplicated=self.deduplicated)
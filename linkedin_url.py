@@ -0,0 +1,122 @@
+"""
+LinkedIn URL canonicalization
+The same post is shared under many URLs: tracking parameters (utm_*, trk,
+rcm...), mobile hosts, trailing slashes, /posts/<slug>-activity-<id>-xxxx
+and /feed/update/urn:li:activity:<id>. Cache keys are built from the post's
+URN instead of the raw string, so all of them share one cache entry and one
+extraction.
+"""
+import re
+from collections import OrderedDict
+from threading import Lock
+from urllib.parse import parse_qsl, unquote, urlencode, urlparse, urlunparse
+
+CANONICAL_HOST = 'www.linkedin.com'
+
+# Query parameters that only track where a link was shared from
+TRACKING_PARAMS = frozenset([
+    'trk', 'trkinfo', 'rcm', 'lipi', 'midtoken', 'midsig', 'trackingid',
+    'originalsubdomain', 'original_referer', 'refid', 'eid', 'otptoken',
+    'src', 'veh', 'lici', 'upsellorderorigin', 'li_fat_id', 'fbclid', 'gclid',
+])
+
+URN_TYPES = ('activity', 'ugcPost', 'share')
+
+# urn:li:activity:123 (also inside updateEntityUrn=urn:li:fs_feedUpdate:(...))
+_URN_RE = re.compile(r'urn:li:(activity|ugcPost|share):(\d+)', re.IGNORECASE)
+# /posts/<author>_<slug>-activity-123-AbCd or -ugcPost-123-AbCd
+_POST_SLUG_RE = re.compile(r'-(activity|ugcPost|share)-(\d+)(?:-|$)', re.IGNORECASE)
+
+
+def _is_tracking_param(name):
+    name = name.lower()
+    return name.startswith('utm_') or name in TRACKING_PARAMS
+
+
+def find_urn(url):
+    """Return (type, id) of the post a LinkedIn URL points to, or None"""
+    decoded = unquote(url)
+    match = _URN_RE.search(decoded)
+    if match is None:
+        match = _POST_SLUG_RE.search(urlparse(decoded).path.rstrip('/'))
+    if match is None:
+        return None
+    kind = next(t for t in URN_TYPES if t.lower() == match.group(1).lower())
+    return kind, match.group(2)
+
+
+def normalize_url(url):
+    """Same URL without tracking parameters, fragment or trailing slash, on the desktop host"""
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    host = parsed.netloc.lower()
+    if host == 'linkedin.com' or host.endswith('.linkedin.com'):
+        scheme, host = 'https', CANONICAL_HOST
+    query = sorted(
+        (name, value) for name, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if not _is_tracking_param(name)
+    )
+    path = parsed.path.rstrip('/') or '/'
+    return urlunparse((scheme, host, path, '', urlencode(query), ''))
+
+
+def canonicalize(url):
+    """Canonical cache identity of a LinkedIn URL: the post URN when there is one"""
+    urn = find_urn(url)
+    if urn is not None:
+        return f'urn:li:{urn[0]}:{urn[1]}'
+    return normalize_url(url)
+
+
+def extraction_url(url):
+    """
+    URL to hand to yt-dlp for `url`
+    Activity URNs become the /feed/update/ form yt-dlp understands; other URLs
+    are only normalized (mobile hosts aren't matched by its LinkedIn extractor)
+    """
+    urn = find_urn(url)
+    if urn is not None and urn[0] == 'activity':
+        return f'https://{CANONICAL_HOST}/feed/update/urn:li:activity:{urn[1]}/'
+    return normalize_url(url)
+
+
+class CanonicalStats:
+    """
+    Hit-rate counters for canonical keys
+    `saved` counts cache hits for a URL spelling this process hadn't seen
+    before, i.e. lookups that a raw-URL key would have missed
+    """
+
+    def __init__(self, max_seen=4096):
+        self.max_seen = max_seen
+        self._seen = OrderedDict()
+        self._lock = Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.saved = 0
+        self.forms = {}
+
+    def record(self, url, canonical, hit):
+        form = canonical.split(':')[2] if canonical.startswith('urn:li:') else 'url'
+        with self._lock:
+            self.lookups += 1
+            self.forms[form] = self.forms.get(form, 0) + 1
+            seen = url in self._seen
+            if hit:
+                self.hits += 1
+                if not seen:
+                    self.saved += 1
+            self._seen[url] = True
+            self._seen.move_to_end(url)
+            if len(self._seen) > self.max_seen:
+                self._seen.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'lookups': self.lookups,
+                'hits': self.hits,
+                'hit_rate': round(self.hits / self.lookups, 3) if self.lookups else 0.0,
+                'saved': self.saved,
+                'forms': dict(self.forms),
+            }
@@ -0,0 +1,464 @@
+"""
+Bounded in-memory cache for extracted video metadata
+Stores a compact projection of the yt-dlp info dict (only the fields the API
+returns) with LRU eviction, a TTL and an approximate byte budget.
+
+An optional shared tier (see CacheBackend) lets every worker process on the
+node reuse each other's extractions and keeps entries across restarts.
+"""
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from formats import compact_formats
+from sqlite_local import LocalConnection
+
+# Rough per-entry bookkeeping cost (OrderedDict node, key string, tuple)
+ENTRY_OVERHEAD = 240
+
+# Top-level info dict fields from_info reads (formats: see formats.FORMAT_FIELDS)
+INFO_FIELDS = ('title', 'duration', 'thumbnail', 'url', 'filesize', 'filesize_approx')
+
+
+class VideoInfo:
+    """Compact metadata record for one video"""
+    __slots__ = ('title', 'duration', 'thumbnail', 'url', 'size', 'formats')
+
+    def __init__(self, title=None, duration=0, thumbnail=None, url=None, size=0, formats=None):
+        self.title = title
+        self.duration = duration
+        self.thumbnail = thumbnail
+        self.url = url
+        self.size = size
+        # Compact list of available renditions (see formats.compact_formats)
+        self.formats = formats or []
+
+    @classmethod
+    def from_info(cls, info, video_url=None, size=0):
+        """Project a full yt-dlp info dict down to the fields we serve"""
+        thumbnail = info.get('thumbnail')
+        if not thumbnail and info.get('thumbnails'):
+            thumbnail = info['thumbnails'][0].get('url')
+        return cls(
+            title=info.get('title'),
+            duration=info.get('duration') or 0,
+            thumbnail=thumbnail,
+            url=video_url or info.get('url'),
+            size=size or info.get('filesize') or info.get('filesize_approx') or 0,
+            formats=compact_formats(info),
+        )
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{field: data.get(field) for field in cls.__slots__})
+
+    def estimated_size(self):
+        """Approximate memory footprint in bytes"""
+        formats = sum(
+            sys.getsizeof(fmt) + sum(sys.getsizeof(value) for value in fmt.values())
+            for fmt in self.formats
+        )
+        return formats + sys.getsizeof(self) + sum(
+            sys.getsizeof(getattr(self, field)) for field in self.__slots__
+        )
+
+    def __repr__(self):
+        return f'VideoInfo(title={self.title!r}, url={self.url!r})'
+
+
+class ExtractionFailure:
+    """Negative cache record: why extracting a video failed"""
+    __slots__ = ('error', 'error_class')
+
+    def __init__(self, error=None, error_class=None):
+        self.error = error
+        self.error_class = error_class
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{field: data.get(field) for field in cls.__slots__})
+
+    def estimated_size(self):
+        return sys.getsizeof(self) + sum(
+            sys.getsizeof(getattr(self, field)) for field in self.__slots__
+        )
+
+    def __repr__(self):
+        return f'ExtractionFailure(error_class={self.error_class!r})'
+
+
+def _decode(payload):
+    """Rebuild a cached record from its JSON form"""
+    data = json.loads(payload)
+    if 'error_class' in data:
+        return ExtractionFailure.from_dict(data)
+    return VideoInfo.from_dict(data)
+
+
+class MetadataCache:
+    """Thread-safe LRU cache with per-entry TTL and a byte budget"""
+
+    def __init__(self, ttl=3600, max_entries=1024, max_bytes=16 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, expires_at, nbytes)
+        self._bytes = 0
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get(key, count=False) is not None
+
+    def _remove(self, key):
+        value, expires_at, nbytes = self._entries.pop(key)
+        self._bytes -= nbytes
+        return value
+
+    def get(self, key, count=True):
+        """Return the cached value, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if count:
+                    self.misses += 1
+                return None
+            value, expires_at, nbytes = entry
+            if time.time() >= expires_at:
+                self._remove(key)
+                self.expirations += 1
+                if count:
+                    self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if count:
+                self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Insert or replace an entry, evicting least recently used ones"""
+        nbytes = value.estimated_size() + len(key) + ENTRY_OVERHEAD
+        if nbytes > self.max_bytes:
+            return
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires_at, nbytes)
+            self._bytes += nbytes
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def expires_at(self, key):
+        """Expiry time of a live entry, or None (doesn't count as a lookup)"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or time.time() >= entry[1]:
+            return None
+        return entry[1]
+
+    def sync(self, key):
+        """Single tier: nothing newer to pick up; returns the expiry time"""
+        return self.expires_at(key)
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+class CacheBackend:
+    """
+    Shared cache tier interface
+    Values are VideoInfo (or ExtractionFailure) records; backends store them serialized with an
+    absolute expiry time. A Redis backend only needs these four methods.
+    """
+
+    def get(self, key):
+        """Return (value, expires_at) or None"""
+        raise NotImplementedError
+
+    def set(self, key, value, expires_at):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def stats(self):
+        return {}
+
+
+class MemoryBackend(CacheBackend):
+    """Process-local stand-in for a shared backend (tests, single worker)"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            payload, expires_at = entry
+            if time.time() >= expires_at:
+                del self._data[key]
+                return None
+        return _decode(payload), expires_at
+
+    def set(self, key, value, expires_at):
+        payload = json.dumps(value.to_dict())
+        with self._lock:
+            self._data[key] = (payload, expires_at)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {'backend': 'memory', 'entries': len(self._data)}
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    Node-wide cache shared by all worker processes through a SQLite file in
+    WAL mode (concurrent readers, one writer). Survives worker recycling.
+    """
+
+    def __init__(self, path=None, max_rows=10000, purge_every=200):
+        self.path = path or os.path.join(tempfile.gettempdir(), 'linkedin_video_cache.sqlite3')
+        self.max_rows = max_rows
+        self.purge_every = purge_every
+        self._db = LocalConnection(self.path, (
+            'CREATE TABLE IF NOT EXISTS video_cache ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+        ))
+        self._writes = 0
+        self.errors = 0
+
+    def get(self, key):
+        try:
+            row = self._db.get().execute(
+                'SELECT value, expires_at FROM video_cache WHERE key = ?', (key,)
+            ).fetchone()
+        except sqlite3.Error:
+            self.errors += 1
+            return None
+        if row is None or time.time() >= row[1]:
+            return None
+        return _decode(row[0]), row[1]
+
+    def set(self, key, value, expires_at):
+        try:
+            conn = self._db.get()
+            conn.execute(
+                'INSERT OR REPLACE INTO video_cache (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, json.dumps(value.to_dict()), expires_at)
+            )
+            self._writes += 1
+            if self._writes % self.purge_every == 0:
+                self._purge(conn)
+        except sqlite3.Error:
+            self.errors += 1
+
+    def _purge(self, conn):
+        """Drop expired rows and trim to max_rows (soonest-expiring first)"""
+        conn.execute('DELETE FROM video_cache WHERE expires_at <= ?', (time.time(),))
+        conn.execute(
+            'DELETE FROM video_cache WHERE key IN ('
+            'SELECT key FROM video_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_rows,)
+        )
+
+    def delete(self, key):
+        try:
+            self._db.get().execute('DELETE FROM video_cache WHERE key = ?', (key,))
+        except sqlite3.Error:
+            self.errors += 1
+
+    def stats(self):
+        try:
+            entries = self._db.get().execute('SELECT COUNT(*) FROM video_cache').fetchone()[0]
+        except sqlite3.Error:
+            entries = None
+        return {'backend': 'sqlite', 'path': self.path, 'entries': entries, 'errors': self.errors}
+
+
+class TieredCache:
+    """
+    Fast per-process MetadataCache in front of a shared CacheBackend
+    Shared hits are promoted into the local tier for their remaining TTL.
+    """
+
+    def __init__(self, local, shared):
+        self.local = local
+        self.shared = shared
+        self.shared_hits = 0
+
+    def get(self, key, count=True):
+        value = self.local.get(key, count=False)
+        if value is not None:
+            if count:
+                self.local.hits += 1
+            return value
+        entry = self.shared.get(key)
+        if entry is None:
+            if count:
+                self.local.misses += 1
+            return None
+        value, expires_at = entry
+        self.local.set(key, value, ttl=expires_at - time.time())
+        if count:
+            self.local.hits += 1
+            self.shared_hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.local.ttl if ttl is None else ttl
+        self.local.set(key, value, ttl=ttl)
+        self.shared.set(key, value, time.time() + ttl)
+
+    def expires_at(self, key):
+        """Expiry time of the local copy, or of the shared one if there is none"""
+        expires_at = self.local.expires_at(key)
+        if expires_at is None:
+            entry = self.shared.get(key)
+            expires_at = entry[1] if entry else None
+        return expires_at
+
+    def sync(self, key):
+        """
+        Pick up a copy another worker refreshed in the shared tier, if it
+        outlives the local one; returns the latest expiry time
+        """
+        expires_at = self.local.expires_at(key)
+        entry = self.shared.get(key)
+        if entry is not None and (expires_at is None or entry[1] > expires_at):
+            value, expires_at = entry
+            self.local.set(key, value, ttl=expires_at - time.time())
+        return expires_at
+
+    def delete(self, key):
+        self.local.delete(key)
+        self.shared.delete(key)
+
+    def clear(self):
+        self.local.clear()
+
+    def stats(self):
+        stats = self.local.stats()
+        stats['shared_hits'] = self.shared_hits
+        stats['shared'] = self.shared.stats()
+        return stats
+
+
+# Seconds a failed extraction is remembered, by error class (see
+# strategy.classify_error); server-side trouble ('busy') is never cached
+NEGATIVE_TTLS = {
+    'private': 900,
+    'login': 900,
+    'unavailable': 3600,
+    'unsupported': 600,
+    'format': 300,
+    'parse': 120,
+    'timeout': 30,
+    'network': 30,
+    'busy': 0,
+}
+
+
+class NegativeCache:
+    """
+    Failed extractions (private, deleted, login required...) so retries and
+    bots hitting a dead URL get the error at once instead of re-running yt-dlp
+    Entries share the metadata cache's storage under a prefixed key and live
+    for a TTL that depends on the error class: long for failures that won't
+    fix themselves, short for transient ones, and not at all for ttl <= 0.
+    """
+    PREFIX = 'neg:'
+
+    def __init__(self, cache, ttls=None, default_ttl=60, enabled=True):
+        self.cache = cache
+        self.ttls = dict(NEGATIVE_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.stored = 0
+
+    def get(self, key):
+        """Return the cached ExtractionFailure for `key`, or None"""
+        if not self.enabled:
+            return None
+        value = self.cache.get(self.PREFIX + key, count=False)
+        if isinstance(value, ExtractionFailure):
+            self.hits += 1
+            return value
+        return None
+
+    def set(self, key, error, error_class):
+        ttl = self.ttls.get(error_class, self.default_ttl)
+        if not self.enabled or ttl <= 0:
+            return
+        self.cache.set(self.PREFIX + key, ExtractionFailure(error, error_class), ttl=ttl)
+        self.stored += 1
+
+    def delete(self, key):
+        self.cache.delete(self.PREFIX + key)
+
+    def stats(self):
+        return {'enabled': self.enabled, 'hits': self.hits, 'stored': self.stored, 'ttls': self.ttls}
+
+
+def create_cache(backend='memory', ttl=3600, max_entries=1024,
+                 max_bytes=16 * 1024 * 1024, path=None):
+    """
+    Build the metadata cache for an app
+    backend: 'memory' (per-process only), 'sqlite' (shared across workers)
+    or 'local' (the tiered setup over an in-process MemoryBackend, to run
+    the shared-tier path without SQLite or Redis)
+    """
+    local = MetadataCache(ttl=ttl, max_entries=max_entries, max_bytes=max_bytes)
+    if backend == 'sqlite':
+        return TieredCache(local, SQLiteBackend(path))
+    if backend == 'local':
+        return TieredCache(local, MemoryBackend())
+    return local
@@ -0,0 +1,209 @@
+"""
+Prometheus-style metrics
+Counters, gauges and histograms rendered in the Prometheus text exposition
+format by GET /metrics. Children for a label set are created once and then
+reused (metric.labels(...) on import, not per request), so recording a value
+is a dict lookup, a bisect and a few additions under an uncontended lock.
+
+Counters other modules already keep for /api/stats are exported through
+collectors, which only run when /metrics is scraped. Values are per process:
+with several gunicorn workers each scrape sees the worker that answered it.
+"""
+from bisect import bisect_left
+from threading import Lock
+
+# Seconds; extraction stages range from sub-millisecond cache hits to 30 s timeouts
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+class _Metric:
+    kind = None
+    _child_class = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = Lock()
+        if not self.labelnames:
+            self._unlabelled = self.labels()
+
+    def _new_child(self):
+        return self._child_class()
+
+    def labels(self, *values):
+        """Child for one label set; keep it around on hot paths"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f'{self.name} expects labels {self.labelnames}')
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _snapshot(self):
+        with self._lock:
+            return list(self._children.items())
+
+
+class Counter(_Metric):
+    """Monotonic counter (name it with a _total suffix)"""
+    kind = 'counter'
+    _child_class = _CounterChild
+
+    def inc(self, amount=1):
+        self._unlabelled.inc(amount)
+
+    def samples(self):
+        for values, child in self._snapshot():
+            yield self.name, _format_labels(self.labelnames, values), child.value
+
+
+class Gauge(Counter):
+    """Value that goes up and down (e.g. active streams)"""
+    kind = 'gauge'
+
+    def dec(self, amount=1):
+        self._unlabelled.dec(amount)
+
+    def set(self, value):
+        self._unlabelled.set(value)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed buckets"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._unlabelled.observe(value)
+
+    def samples(self):
+        for values, child in self._snapshot():
+            with child._lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                cumulative += n
+                labels = _format_labels(self.labelnames, values, ('le', _format_value(float(bound))))
+                yield self.name + '_bucket', labels, cumulative
+            labels = _format_labels(self.labelnames, values)
+            yield self.name + '_sum', labels, total
+            yield self.name + '_count', labels, count
+
+
+class Registry:
+    """Set of metrics plus collectors, rendered together"""
+
+    def __init__(self, namespace=''):
+        self.namespace = namespace
+        self._metrics = []
+        self._collectors = []
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def _full_name(self, name):
+        return f'{self.namespace}_{name}' if self.namespace else name
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(self._full_name(name), documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(self._full_name(name), documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(self._full_name(name), documentation, labelnames, buckets))
+
+    def collector(self, name, kind, documentation, labelnames, collect):
+        """
+        Metric whose values are read at scrape time: collect() returns
+        {label values tuple: value}, e.g. from an existing stats() dict
+        """
+        self._collectors.append((self._full_name(name), kind, documentation, tuple(labelnames), collect))
+
+    def render(self):
+        """Text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {_format_value(value)}')
+        for name, kind, documentation, labelnames, collect in self._collectors:
+            try:
+                values = collect()
+            except Exception:
+                continue
+            lines.append(f'# HELP {name} {documentation}')
+            lines.append(f'# TYPE {name} {kind}')
+            for label_values, value in values.items():
+                lines.append(f'{name}{_format_labels(labelnames, label_values)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
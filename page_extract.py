@@ -0,0 +1,169 @@
+"""
+Fast path for public LinkedIn posts
+The post page embeds the video sources as JSON in the <video data-sources>
+attribute. Fetching the page with the pooled session and scanning it for
+that tag (stopping as soon as it has been seen) is much cheaper than a
+yt-dlp run. Callers fall back to yt-dlp whenever this returns None.
+"""
+import codecs
+import html
+import json
+import re
+from threading import Lock
+
+# The <video> tag comes after <head>; pages bigger than this aren't scanned further
+MAX_PAGE_BYTES = 2 * 1024 * 1024
+READ_SIZE = 64 * 1024
+
+_VIDEO_TAG_RE = re.compile(r'<video\b[^>]*>', re.IGNORECASE)
+_META_TAG_RE = re.compile(r'<meta\b[^>]*>', re.IGNORECASE)
+_ATTR_RE = re.compile(r'([\w:-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+_TITLE_RE = re.compile(r'<title[^>]*>([^<]*)</title>', re.IGNORECASE)
+
+
+def _attributes(tag):
+    return {
+        name.lower(): html.unescape(double if double is not None else single)
+        for name, double, single in _ATTR_RE.findall(tag)
+    }
+
+
+def _collect_meta(text, properties):
+    """Add og:* / twitter:* meta tags found in `text` to `properties`"""
+    for tag in _META_TAG_RE.findall(text):
+        attrs = _attributes(tag)
+        name = attrs.get('property') or attrs.get('name')
+        if name and 'content' in attrs:
+            properties.setdefault(name.lower(), attrs['content'])
+
+
+def _bitrate(source):
+    try:
+        return float(source.get('data-bitrate') or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _pick_source(sources):
+    """Highest-bitrate MP4 source, else the highest-bitrate one (best[ext=mp4]/best)"""
+    candidates = [s for s in sources if isinstance(s, dict) and s.get('src')]
+    mp4 = [s for s in candidates if 'mp4' in (s.get('type') or '')]
+    pool = mp4 or candidates
+    return max(pool, key=_bitrate) if pool else None
+
+
+def _source_format(source):
+    """yt-dlp format dict for a data-sources entry (as its LinkedIn extractor builds it)"""
+    kind = source.get('type') or ''
+    return {
+        'url': source['src'],
+        'ext': kind.split('/')[-1] if kind.startswith('video/') else None,
+        'tbr': _bitrate(source) / 1000 or None,
+    }
+
+
+def parse_post_page(chunks):
+    """
+    Scan HTML chunks (bytes) for the post video and metadata
+    Returns a yt-dlp-like info dict, or None if the page has no usable video.
+    Only complete tags are scanned and then dropped, so memory stays around
+    one chunk, and reading stops once the <video> tag has been seen.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')('replace')
+    meta = {}
+    title = None
+    video_tag = None
+    tail = ''
+    scanned = 0
+    for chunk in chunks:
+        text = tail + (decoder.decode(chunk) if isinstance(chunk, bytes) else chunk)
+        scanned += len(chunk)
+        # Keep an unfinished tag at the end for the next chunk
+        cut = text.rfind('<')
+        if cut != -1 and text.find('>', cut) == -1:
+            text, tail = text[:cut], text[cut:]
+        else:
+            tail = ''
+        # Same for a <title> whose text continues in the next chunk
+        start = text.rfind('<title') if title is None else -1
+        if start != -1 and '</title>' not in text[start:]:
+            text, tail = text[:start], text[start:] + tail
+        for match in _VIDEO_TAG_RE.finditer(text):
+            if 'data-sources' in match.group(0):
+                video_tag = match.group(0)
+                text = text[:match.start()]
+                break
+        _collect_meta(text, meta)
+        if title is None:
+            match = _TITLE_RE.search(text)
+            if match:
+                title = html.unescape(match.group(1)).strip()
+        if video_tag is not None or scanned >= MAX_PAGE_BYTES:
+            break
+    if video_tag is None:
+        return None
+
+    video = _attributes(video_tag)
+    try:
+        sources = json.loads(video['data-sources'])
+    except (KeyError, ValueError):
+        return None
+    source = _pick_source(sources if isinstance(sources, list) else [])
+    if source is None:
+        return None
+
+    return {
+        'title': meta.get('og:title') or meta.get('twitter:title') or title,
+        'url': source['src'],
+        'thumbnail': meta.get('og:image') or video.get('data-poster') or video.get('poster'),
+        'duration': 0,
+        'formats': [_source_format(s) for s in sources if isinstance(s, dict) and s.get('src')],
+    }
+
+
+class PageExtractor:
+    """Fetch a LinkedIn post page and parse its video without yt-dlp"""
+
+    def __init__(self, timeout=10, session=None):
+        self.timeout = timeout
+        self.session = session
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def extract(self, url):
+        """Return an info dict for `url`, or None to fall back to yt-dlp"""
+        if self.session is None:
+            from http_pool import get_session
+            self.session = get_session()
+        try:
+            response = self.session.get(
+                url,
+                headers={'Accept': 'text/html'},
+                stream=True,
+                timeout=self.timeout
+            )
+        except Exception:
+            self._count('errors')
+            return None
+        try:
+            if not response.ok or 'html' not in response.headers.get('Content-Type', 'text/html'):
+                info = None
+            else:
+                info = parse_post_page(response.iter_content(chunk_size=READ_SIZE))
+        except Exception:
+            info = None
+        finally:
+            # Closing early drops the rest of the page instead of reading it
+            response.close()
+        self._count('hits' if info else 'misses')
+        return info
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'errors': self.errors}
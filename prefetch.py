@@ -0,0 +1,357 @@
+"""
+Prefetch and refresh-ahead for the metadata cache
+Posts we know will get traffic (e.g. our own marketing videos) can be
+extracted before anyone asks for them, and cached entries are re-extracted
+shortly before they expire: the signed CDN video_url they hold stops working,
+so an entry that simply ran out would cost its next user a full extraction.
+
+Refreshes come from two places:
+- URLs passed to warm() (this script or POST /api/admin/prefetch) are
+  pinned, and the refresh thread keeps them fresh. With CACHE_BACKEND=sqlite
+  pins are kept in a SQLite file (SQLitePins) that every process on the node
+  reads, so URLs this script pins in-process are refreshed by the running
+  servers after it exits; with the memory backend they only live as long as
+  the process that pinned them
+- a cache hit within `refresh_before` seconds of expiry refreshes that
+  entry in the background, so hot entries never go cold
+They run on a small bounded pool, at most one per cache key at a time.
+
+Usage:
+    python prefetch.py urls.txt [--download] [--force]
+    python prefetch.py urls.txt --server https://example.com --token $ADMIN_TOKEN
+
+With no --server the URLs are extracted in this process into the node's
+shared cache (CACHE_BACKEND=sqlite, the default) and download directory,
+PREFETCH_WORKERS at a time; --server asks a running instance to do it
+through its admin endpoint.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from threading import Lock
+
+from sqlite_local import LocalConnection
+
+WARMED = 'warmed'
+CACHED = 'cached'
+FAILED = 'failed'
+
+
+class MemoryPins:
+    """Pinned URLs of this process; the oldest are dropped past max_pinned"""
+
+    def __init__(self, max_pinned=1000):
+        self.max_pinned = max_pinned
+        self._pins = OrderedDict()  # key -> url
+        self._lock = Lock()
+
+    def add(self, key, url):
+        with self._lock:
+            self._pins.pop(key, None)
+            self._pins[key] = url
+            while len(self._pins) > self.max_pinned:
+                self._pins.popitem(last=False)
+
+    def items(self):
+        with self._lock:
+            return list(self._pins.items())
+
+    def claim(self, key, seconds):
+        """Only this process refreshes its pins"""
+        return True
+
+    def __len__(self):
+        return len(self._pins)
+
+
+class SQLitePins:
+    """
+    Pinned URLs shared by every process on the node through a SQLite file
+    Each refresh thread claims a due pin before refreshing it, so the
+    workers don't all re-extract the same URL at once.
+    """
+
+    def __init__(self, path=None, max_pinned=1000):
+        self.path = path or os.path.join(tempfile.gettempdir(), 'linkedin_video_prefetch.sqlite3')
+        self.max_pinned = max_pinned
+        self._db = LocalConnection(self.path, (
+            'CREATE TABLE IF NOT EXISTS prefetch_pins ('
+            'key TEXT PRIMARY KEY, url TEXT NOT NULL, pinned REAL NOT NULL, '
+            'claimed_until REAL NOT NULL DEFAULT 0)'
+        ))
+        self.errors = 0
+
+    def add(self, key, url):
+        try:
+            conn = self._db.get()
+            conn.execute(
+                'INSERT OR REPLACE INTO prefetch_pins (key, url, pinned) VALUES (?, ?, ?)',
+                (key, url, time.time())
+            )
+            conn.execute(
+                'DELETE FROM prefetch_pins WHERE key IN ('
+                'SELECT key FROM prefetch_pins ORDER BY pinned DESC LIMIT -1 OFFSET ?)',
+                (self.max_pinned,)
+            )
+        except sqlite3.Error:
+            self.errors += 1
+
+    def items(self):
+        try:
+            return self._db.get().execute('SELECT key, url FROM prefetch_pins ORDER BY pinned').fetchall()
+        except sqlite3.Error:
+            self.errors += 1
+            return []
+
+    def claim(self, key, seconds):
+        """Whether this process gets to refresh `key` (no one else has for `seconds`)"""
+        now = time.time()
+        try:
+            cursor = self._db.get().execute(
+                'UPDATE prefetch_pins SET claimed_until = ? WHERE key = ? AND claimed_until <= ?',
+                (now + seconds, key, now)
+            )
+        except sqlite3.Error:
+            self.errors += 1
+            return False
+        return cursor.rowcount == 1
+
+    def __len__(self):
+        try:
+            return self._db.get().execute('SELECT COUNT(*) FROM prefetch_pins').fetchone()[0]
+        except sqlite3.Error:
+            self.errors += 1
+            return 0
+
+
+def create_pins(backend='memory', path=None, max_pinned=1000):
+    """Pin store: 'memory' (this process) or 'sqlite' (every process on the node)"""
+    if backend == 'sqlite':
+        return SQLitePins(path, max_pinned)
+    return MemoryPins(max_pinned)
+
+
+class Prefetcher:
+    """
+    Keeps cache entries fresh by re-extracting them ahead of expiry
+    load(url, force) extracts `url` and replaces its cache entry, returning
+    an error message or None (force: even if it turns out to be fresh after
+    all, e.g. refreshed by another worker); expires_at(key) is the entry's expiry time (None
+    if it isn't cached); key(url) is the cache key; pins is a MemoryPins or
+    SQLitePins store
+    """
+
+    def __init__(self, load, expires_at, key, workers=4, refresh_before=300,
+                 max_pending=256, pins=None):
+        self.load = load
+        self.expires_at = expires_at
+        self.key = key
+        self.workers = workers
+        self.refresh_before = refresh_before
+        self.max_pending = max_pending
+        self.pins = pins if pins is not None else MemoryPins()
+        self._pending = set()
+        self._lock = Lock()
+        self._executor = None
+        self.warmed = 0
+        self.refreshed = 0
+        self.failed = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='prefetch')
+        return self._executor
+
+    def due(self, key):
+        """Whether an entry is missing or expires within refresh_before seconds"""
+        expires_at = self.expires_at(key)
+        return expires_at is None or expires_at - time.time() < self.refresh_before
+
+    def touch(self, url, key):
+        """Cache hit on `key`: refresh it in the background if it is about to expire"""
+        if self.refresh_before > 0 and self.due(key):
+            self._schedule(url, key)
+
+    def pin(self, url, key):
+        self.pins.add(key, url)
+
+    def refresh_pinned(self):
+        """Refresh thread task: re-extract pinned entries that are due"""
+        for key, url in self.pins.items():
+            # A claim lasts refresh_before (at least a minute), so a failed
+            # refresh is retried by some process after it
+            if self.due(key) and self.pins.claim(key, max(60, self.refresh_before)):
+                self._schedule(url, key)
+
+    def _schedule(self, url, key):
+        with self._lock:
+            if key in self._pending or len(self._pending) >= self.max_pending:
+                return None
+            self._pending.add(key)
+        return self._get_executor().submit(self._refresh, url, key)
+
+    def _load(self, url, force=False):
+        start = time.perf_counter()
+        try:
+            error = self.load(url, force)
+        except Exception as e:
+            error = str(e)
+        if error:
+            self.failed += 1
+        return {
+            'url': url,
+            'status': FAILED if error else WARMED,
+            'error': error,
+            'seconds': round(time.perf_counter() - start, 3),
+        }
+
+    def _refresh(self, url, key):
+        try:
+            result = self._load(url)
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+        if result['status'] == WARMED:
+            self.refreshed += 1
+        return result
+
+    def warm(self, urls, force=False, pin=True):
+        """
+        Extract each URL that isn't freshly cached (all of them with force),
+        yielding one result dict per distinct URL as it finishes
+        A background refresh of the same URL may be running; load() is
+        expected to coalesce the two (the app's single-flight does)
+        """
+        futures = {}
+        for url in dict.fromkeys(urls):
+            key = self.key(url)
+            if pin:
+                self.pin(url, key)
+            if not force and not self.due(key):
+                yield {'url': url, 'status': CACHED, 'error': None, 'seconds': 0.0}
+                continue
+            futures[self._get_executor().submit(self._load, url, force)] = url
+        for future in as_completed(futures):
+            result = future.result()
+            if result['status'] == WARMED:
+                self.warmed += 1
+            yield result
+
+    def stats(self):
+        pinned = len(self.pins)
+        with self._lock:
+            return {
+                'pinned': pinned,
+                'pending': len(self._pending),
+                'refresh_before': self.refresh_before,
+                'warmed': self.warmed,
+                'refreshed': self.refreshed,
+                'failed': self.failed,
+            }
+
+
+def _read_urls(path):
+    handle = sys.stdin if path == '-' else open(path)
+    with handle:
+        return [line.strip() for line in handle if line.strip() and not line.startswith('#')]
+
+
+def _prefetch_remote(server, token, urls, download, force):
+    import requests
+
+    response = requests.post(
+        server.rstrip('/') + '/api/admin/prefetch',
+        json={'urls': urls, 'download': download, 'force': force},
+        headers={'Authorization': f'Bearer {token}'},
+        stream=True,
+        timeout=(10, None)
+    )
+    if not response.ok:
+        raise SystemExit(f'{response.status_code}: {response.text.strip()}')
+    if response.status_code == 202:
+        # Long lists run as a background job: follow its results as they come in
+        yield from _follow_job(server.rstrip('/'), response.json(), token)
+        return
+    for line in response.iter_lines():
+        if line:
+            yield json.loads(line)
+
+
+def _follow_job(server, status, token, interval=2.0):
+    """Poll a background prefetch job, yielding its result lines as they are written"""
+    import requests
+
+    headers = {'Authorization': f'Bearer {token}'}
+    seen = 0
+    while True:
+        if status['status'] == 'failed':
+            raise SystemExit(f'prefetch job failed: {status["error"]}')
+        # Status first: once it says done, this read gets every remaining line
+        done = status['status'] == 'done'
+        response = requests.get(
+            server + status['results_url'],
+            params={'partial': 1, 'start': seen},
+            headers=headers,
+            timeout=(10, None)
+        )
+        if not response.ok:
+            raise SystemExit(f'{response.status_code}: {response.text.strip()}')
+        for line in response.iter_lines():
+            if line:
+                seen += 1
+                yield json.loads(line)
+        if done:
+            return
+        time.sleep(interval)
+        response = requests.get(server + status['status_url'], headers=headers, timeout=10)
+        if not response.ok:
+            raise SystemExit(f'{response.status_code}: {response.text.strip()}')
+        status = dict(response.json(), status_url=status['status_url'])
+
+
+def _prefetch_local(urls, download, force):
+    import app
+
+    results = list(app.prefetch_urls(urls, download=download, force=force))
+    for result in results:
+        if result.get('job_id'):
+            # Don't exit (and kill the download threads) before they finish
+            job = app.download_jobs.get(result['job_id'])
+            while job is not None and job.active:
+                time.sleep(0.5)
+            if job is not None:
+                result['download'] = job.status
+                result['error'] = result['error'] or job.error
+        yield result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Pre-extract LinkedIn video URLs into the cache')
+    parser.add_argument('file', help='file with one URL per line (- for stdin)')
+    parser.add_argument('--download', action='store_true', help='also fetch the videos into the disk cache')
+    parser.add_argument('--force', action='store_true', help='re-extract URLs that are already cached')
+    parser.add_argument('--server', help='running instance to prefetch on (uses its admin endpoint)')
+    parser.add_argument('--token', help='ADMIN_TOKEN of --server')
+    args = parser.parse_args(argv)
+
+    urls = _read_urls(args.file)
+    if args.server:
+        results = _prefetch_remote(args.server, args.token or '', urls, args.download, args.force)
+    else:
+        results = _prefetch_local(urls, args.download, args.force)
+
+    failed = 0
+    for result in results:
+        failed += result['status'] == FAILED or result.get('download') == FAILED
+        print(json.dumps(result))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
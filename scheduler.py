@@ -0,0 +1,58 @@
+"""
+Background maintenance scheduler
+Runs housekeeping (cache eviction, file cleanup) on a daemon thread instead of
+inline on user requests
+"""
+import threading
+
+
+class BackgroundScheduler:
+    """Call `task` every `interval` seconds (or sooner when woken)"""
+
+    def __init__(self, interval, task, name='maintenance'):
+        self.interval = interval
+        self.task = task
+        self.name = name
+        self.runs = 0
+        self.errors = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the thread once per process (safe to call on every request)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        """Run the task as soon as possible"""
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.task()
+            except Exception as e:
+                self.errors += 1
+                print(f"{self.name} error: {e}")
+            self.runs += 1
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def stats(self):
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'runs': self.runs,
+            'errors': self.errors,
+        }
@@ -0,0 +1,119 @@
+"""
+Background video size resolution
+Issues the HEAD request for Content-Length off the request path and caches
+the result separately from the video metadata
+"""
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from threading import Lock
+
+
+
+class SizeProber:
+    """Resolve video sizes with HEAD requests on a small thread pool"""
+
+    def __init__(self, max_workers=4, timeout=5, ttl=3600, failure_ttl=60, max_entries=4096,
+                 session=None, timer=None):
+        self.session = session
+        # Optional histogram (anything with observe(seconds)) for probe latency
+        self.timer = timer
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.ttl = ttl
+        # Failed probes are remembered briefly so cache hits don't re-probe
+        self.failure_ttl = failure_ttl
+        self.max_entries = max_entries
+        self._sizes = OrderedDict()  # video_url -> (size, expires_at)
+        self._pending = {}           # video_url -> Future
+        self._lock = Lock()
+        self._executor = None
+        self.probes = 0
+        self.failures = 0
+
+    def _get_executor(self):
+        # Created lazily so importing the app doesn't start threads
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix='size-probe'
+            )
+        return self._executor
+
+    def _head(self, video_url):
+        if self.session is None:
+            # requests is only imported once the first probe runs (cold start)
+            from http_pool import get_session
+            self.session = get_session()
+        session = self.session
+        response = session.head(video_url, timeout=self.timeout, allow_redirects=True)
+        response.close()
+        content_length = response.headers.get('Content-Length')
+        return int(content_length) if content_length else 0
+
+    def _probe(self, video_url):
+        self.probes += 1
+        start = time.perf_counter()
+        try:
+            size = self._head(video_url)
+        except Exception:
+            self.failures += 1
+            size = 0
+        if self.timer is not None:
+            self.timer.observe(time.perf_counter() - start)
+        ttl = self.ttl if size else self.failure_ttl
+        with self._lock:
+            self._pending.pop(video_url, None)
+            self._sizes[video_url] = (size, time.time() + ttl)
+            while len(self._sizes) > self.max_entries:
+                self._sizes.popitem(last=False)
+        return size
+
+    def get(self, video_url):
+        """Return the cached size (0 if it couldn't be determined), or None if not probed yet"""
+        with self._lock:
+            entry = self._sizes.get(video_url)
+            if entry is None:
+                return None
+            size, expires_at = entry
+            if time.time() >= expires_at:
+                del self._sizes[video_url]
+                return None
+            return size
+
+    def is_pending(self, video_url):
+        with self._lock:
+            return video_url in self._pending
+
+    def submit(self, video_url):
+        """Start a probe for `video_url` unless one is already running"""
+        with self._lock:
+            future = self._pending.get(video_url)
+            if future is None:
+                future = self._get_executor().submit(self._probe, video_url)
+                self._pending[video_url] = future
+            return future
+
+    def resolve(self, video_url, wait=0):
+        """
+        Return the size if known, otherwise start a background probe and wait
+        at most `wait` seconds for it. Returns None if still pending.
+        """
+        size = self.get(video_url)
+        if size is not None:
+            return size
+        future = self.submit(video_url)
+        if wait <= 0:
+            return None
+        try:
+            return future.result(timeout=wait)
+        except FutureTimeout:
+            return None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'cached': len(self._sizes),
+                'pending': len(self._pending),
+                'probes': self.probes,
+                'failures': self.failures,
+            }
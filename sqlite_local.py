@@ -0,0 +1,33 @@
+"""
+Per-thread SQLite connections for the node-wide shared stores
+(metadata_cache.SQLiteBackend, admission.SQLiteBucketStore)
+sqlite3 connections can't be shared between threads, and one inherited
+through gunicorn's fork would share the parent's file locks, so each thread
+of each process opens its own. WAL mode lets readers run alongside the
+single writer.
+"""
+import os
+import sqlite3
+import threading
+
+
+class LocalConnection:
+    """A WAL-mode connection to `path` per thread, with `schema` applied on open"""
+
+    def __init__(self, path, schema, timeout=5):
+        self.path = path
+        self.schema = schema
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def get(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(self.schema)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
@@ -0,0 +1,278 @@
+"""
+Extraction strategy engine
+The fallback extraction methods used to run strictly one after another, each
+with its own timeout, so a video that only works with the last method took
+the sum of all of them. StrategyRacer runs them:
+  sequential - one at a time, next on failure (the old behaviour)
+  hedged     - next one also starts if the current one is slower than hedge_delay
+  race       - all at once
+The first success wins and the rest are cancelled. Wins are recorded per
+method, and per error class of the failure that preceded them, so later
+requests start with the method that usually works.
+
+A running yt-dlp call can't be interrupted, so a cancelled loser keeps going
+until it finishes on its own. With a `limiter`, every attempt holds one of
+its slots until then: the caller's slot covers the first attempt, hedges
+only start if a spare slot is free, and losers still running when extract()
+returns keep theirs. The limiter then bounds actual yt-dlp runs.
+"""
+import re
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from threading import Event, Lock
+
+SEQUENTIAL = 'sequential'
+HEDGED = 'hedged'
+RACE = 'race'
+
+# Older wins count for less, so the order adapts when LinkedIn changes
+WIN_DECAY = 0.98
+
+
+# "HTTP Error 404: Not Found" (yt-dlp), "404 Client Error: ..." (requests)
+_HTTP_STATUS_RE = re.compile(r'http error (\d{3})|\b(\d{3}) (?:client|server) error')
+
+
+def classify_error(error_msg):
+    """
+    Coarse class of a raw extraction error message (yt-dlp's or the HTTP
+    client's, not the text formatted for users)
+    """
+    msg = (error_msg or '').lower()
+    if 'timed out' in msg or 'timeout' in msg:
+        return 'timeout'
+    if 'busy' in msg:
+        return 'busy'
+    # A deleted post is "Unable to download webpage: HTTP Error 404", so the
+    # status decides before the generic network rule below
+    match = _HTTP_STATUS_RE.search(msg)
+    if match:
+        status = int(match.group(1) or match.group(2))
+        if status in (404, 410):
+            return 'unavailable'
+        if status in (401, 403):
+            return 'login'
+        return 'network'
+    if 'private' in msg or 'restricted' in msg:
+        return 'private'
+    if 'login' in msg or 'sign in' in msg or 'authentication' in msg:
+        return 'login'
+    if 'not found' in msg or 'unavailable' in msg or 'removed' in msg:
+        return 'unavailable'
+    if 'unable to download' in msg or 'connection' in msg:
+        return 'network'
+    if 'unable to extract' in msg:
+        return 'unsupported'
+    if 'requested format' in msg:
+        return 'format'
+    if 'parse' in msg:
+        return 'parse'
+    return 'other'
+
+
+def _method_label(method):
+    return method.get('format') or 'default'
+
+
+class StrategyRacer:
+    """
+    Run extraction methods concurrently and return the first success
+    run(url, method, cancel) returns (info, error); it should give up early
+    once the `cancel` event is set. Callers of extract() hold one `limiter`
+    slot (an admission.ConcurrencyLimiter) for the duration of the call.
+    extract() gives up with a timeout error after `max_time` seconds (None: no limit)
+    """
+
+    def __init__(self, methods, run, mode=HEDGED, hedge_delay=3.0, max_workers=16, limiter=None,
+                 max_time=None):
+        self.methods = list(methods)
+        self.run = run
+        self.mode = mode
+        self.hedge_delay = hedge_delay
+        self.limiter = limiter
+        self.max_time = max_time
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='extract')
+        self._lock = Lock()
+        # Decayed win scores drive the order; raw counts are for metrics
+        self._scores = [0.0] * len(self.methods)
+        self._scores_after = {}  # error class -> scores
+        self.wins = [0] * len(self.methods)
+        self.failures = [0] * len(self.methods)
+        self.errors = {}
+        self.launched = 0
+        self.cancelled = 0
+        self.exhausted = 0
+        self.timed_out = 0
+        self.hedges_skipped = 0
+        self._time_to_success = deque(maxlen=1024)
+
+    def _next_method(self, tried, error_class=None):
+        """Index of the most promising untried method, or None"""
+        with self._lock:
+            after = self._scores_after.get(error_class)
+            candidates = [i for i in range(len(self.methods)) if i not in tried]
+            if not candidates:
+                return None
+            # Best after this kind of failure, then best overall, then configured order
+            return max(candidates, key=lambda i: (
+                after[i] if after else 0.0, self._scores[i], -i
+            ))
+
+    def _record_win(self, index, error_class, elapsed):
+        with self._lock:
+            self.wins[index] += 1
+            self._scores = [s * WIN_DECAY for s in self._scores]
+            self._scores[index] += 1
+            if error_class is not None:
+                after = self._scores_after.setdefault(error_class, [0.0] * len(self.methods))
+                for i in range(len(after)):
+                    after[i] *= WIN_DECAY
+                after[index] += 1
+            self._time_to_success.append(elapsed)
+
+    def _record_failure(self, index, error_class):
+        with self._lock:
+            self.failures[index] += 1
+            self.errors[error_class] = self.errors.get(error_class, 0) + 1
+
+    def extract(self, url):
+        """Return (info, error) from the first method that succeeds"""
+        start = time.monotonic()
+        deadline = None if self.max_time is None else start + self.max_time
+        cancel = Event()
+        pending = {}  # future -> method index
+        tried = []
+        last_error = None
+        last_class = None
+        # Limiter slots held for this call's attempts, the caller's included
+        slots = [1]
+
+        def launch(error_class=None):
+            index = self._next_method(tried, error_class)
+            if index is None:
+                return False
+            if self.limiter is not None and len(pending) >= slots[0]:
+                # A hedge needs a slot of its own; skip it when the limiter is full
+                if not self.limiter.try_acquire():
+                    with self._lock:
+                        self.hedges_skipped += 1
+                    return False
+                slots[0] += 1
+            tried.append(index)
+            future = self._executor.submit(self.run, url, self.methods[index], cancel)
+            pending[future] = index
+            with self._lock:
+                self.launched += 1
+            return True
+
+        launch()
+        if self.mode == RACE:
+            while launch():
+                pass
+        last_launch = time.monotonic()
+
+        try:
+            while pending:
+                now = time.monotonic()
+                if deadline is not None and now >= deadline:
+                    # Raw error text, so callers classify it as a (transient) timeout
+                    last_error = f'Extraction timed out after {self.max_time:g} seconds'
+                    with self._lock:
+                        self.timed_out += 1
+                    return None, last_error
+                timeout = None if deadline is None else deadline - now
+                hedge_at = None
+                if self.mode == HEDGED and len(tried) < len(self.methods):
+                    hedge_at = last_launch + self.hedge_delay
+                    until_hedge = max(0.0, hedge_at - now)
+                    timeout = until_hedge if timeout is None else min(timeout, until_hedge)
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    if hedge_at is not None and time.monotonic() >= hedge_at:
+                        # Current attempts are slow: hedge with the next method
+                        # (or, with no slot free, try again after another hedge_delay)
+                        launch(last_class)
+                        last_launch = time.monotonic()
+                    continue
+                for future in done:
+                    index = pending.pop(future)
+                    try:
+                        info, error = future.result()
+                    except Exception as e:
+                        info, error = None, str(e)
+                    if info and not error:
+                        self._record_win(index, last_class, time.monotonic() - start)
+                        return info, None
+                    last_error = error
+                    last_class = classify_error(error)
+                    self._record_failure(index, last_class)
+                if self.mode == RACE:
+                    # Methods skipped for want of a slot start as others fail
+                    while launch(last_class):
+                        pass
+                elif launch(last_class):
+                    last_launch = time.monotonic()
+                self._release_idle_slots(slots, len(pending))
+        finally:
+            # Losers: queued attempts never start, running ones see `cancel`
+            cancel.set()
+            running = [future for future in pending if not future.cancel()]
+            with self._lock:
+                self.cancelled += len(pending)
+            if self.limiter is not None:
+                self._hand_over_slots(slots[0], running)
+
+        with self._lock:
+            self.exhausted += 1
+        return None, last_error
+
+    def _release_idle_slots(self, slots, running):
+        """Give back hedge slots whose attempts have failed (never the caller's)"""
+        while self.limiter is not None and slots[0] > max(1, running):
+            self.limiter.release()
+            slots[0] -= 1
+
+    def _hand_over_slots(self, held, running):
+        """
+        Leave one limiter slot with each attempt still running, released when
+        it finishes; the caller releases its own slot after extract() returns
+        """
+        extra = held - len(running) - 1
+        if extra < 0:
+            # One short: take over the slot the caller is about to give back
+            self.limiter.try_acquire(force=True)
+        for _ in range(extra):
+            self.limiter.release()
+        for future in running:
+            future.add_done_callback(lambda _: self.limiter.release())
+
+    def stats(self):
+        with self._lock:
+            samples = sorted(self._time_to_success)
+            wins = {_method_label(m): n for m, n in zip(self.methods, self.wins)}
+            failures = {_method_label(m): n for m, n in zip(self.methods, self.failures)}
+            counters = {
+                'launched': self.launched,
+                'cancelled': self.cancelled,
+                'exhausted': self.exhausted,
+                'timed_out': self.timed_out,
+                'hedges_skipped': self.hedges_skipped,
+                'errors': dict(self.errors),
+            }
+        time_to_success = {'count': len(samples)}
+        if samples:
+            time_to_success.update({
+                'avg': round(sum(samples) / len(samples), 3),
+                'p50': round(samples[len(samples) // 2], 3),
+                'p95': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+                'max': round(samples[-1], 3),
+            })
+        return dict(
+            counters,
+            mode=self.mode,
+            hedge_delay=self.hedge_delay,
+            wins=wins,
+            failures=failures,
+            time_to_success=time_to_success,
+        )
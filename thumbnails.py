@@ -0,0 +1,183 @@
+"""
+Thumbnail proxy with resized, cached variants
+/api/extract used to hand browsers LinkedIn's full-size thumbnail URL, which
+is signed and stops working once the signature expires. Instead the image is
+fetched once per video, kept on disk, and resized/recompressed to a few fixed
+widths for the preview card. Variants sit in a bounded memory tier in front
+of a bounded disk tier (both keyed by video ID), so previews keep working
+after the CDN URL has expired.
+
+Resizing needs Pillow (in requirements.txt); if it is missing anyway, every
+width is served the original image and stats() reports 'resize': False.
+"""
+import hashlib
+import os
+import sys
+from io import BytesIO
+
+from disk_cache import DiskCache
+from metadata_cache import MetadataCache
+from singleflight import SingleFlight
+
+# Optional: resizing and recompression
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    Image = None
+    PIL_AVAILABLE = False
+
+IMAGE_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.png': 'image/png',
+    '.webp': 'image/webp',
+    '.gif': 'image/gif',
+}
+IMAGE_EXTS = tuple(IMAGE_TYPES)
+_EXT_BY_TYPE = dict({mimetype: ext for ext, mimetype in IMAGE_TYPES.items()}, **{'image/jpg': '.jpg'})
+
+# Widths the preview card asks for; other widths are rounded up to one of these
+THUMBNAIL_WIDTHS = (160, 320, 640)
+
+# Originals bigger than this are not proxied
+MAX_SOURCE_BYTES = 5 * 1024 * 1024
+
+
+class Thumbnail:
+    """Image bytes plus the validator served with them"""
+    __slots__ = ('data', 'mimetype', 'etag')
+
+    def __init__(self, data, mimetype):
+        self.data = data
+        self.mimetype = mimetype
+        self.etag = hashlib.md5(data).hexdigest()
+
+    def estimated_size(self):
+        return sys.getsizeof(self) + sys.getsizeof(self.data) + 2 * 64
+
+
+def _resize(data, width, quality):
+    """Scale an image down to `width` pixels and recompress it as JPEG"""
+    with Image.open(BytesIO(data)) as image:
+        image = image.convert('RGB')
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+        out = BytesIO()
+        image.save(out, 'JPEG', quality=quality, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+class ThumbnailCache:
+    """Fetch-once, resize-once thumbnail store with memory and disk tiers"""
+
+    def __init__(self, directory, widths=THUMBNAIL_WIDTHS, quality=80,
+                 max_bytes=256 * 1024 * 1024, max_age=7 * 86400,
+                 memory_bytes=8 * 1024 * 1024, timeout=10, session=None):
+        self.widths = tuple(sorted(widths))
+        self.quality = quality
+        self.timeout = timeout
+        self.session = session
+        self.disk = DiskCache(directory, max_bytes=max_bytes, max_age=max_age, exts=IMAGE_EXTS)
+        self.memory = MetadataCache(ttl=max_age, max_entries=1024, max_bytes=memory_bytes)
+        # Concurrent requests for a new variant share one fetch/resize
+        self._flight = SingleFlight()
+        self.fetches = 0
+        self.resizes = 0
+        self.errors = 0
+
+    def variant_width(self, width):
+        """Configured width to serve for a requested one (0: the original)"""
+        if not PIL_AVAILABLE:
+            return 0
+        if not width:
+            return self.widths[-1]
+        return next((w for w in self.widths if w >= width), self.widths[-1])
+
+    def get(self, video_id, source_url=None, width=None):
+        """
+        Thumbnail of `video_id` about `width` pixels wide, or None when it
+        isn't cached and there is no `source_url` to fetch it from
+        """
+        width = self.variant_width(width)
+        key = f'{video_id}-{width or "orig"}'
+        thumb = self.memory.get(key)
+        if thumb is None:
+            thumb = self._load(key) or self._flight.do(key, self._build, video_id, source_url, width)
+            if thumb is not None:
+                self.memory.set(key, thumb)
+        return thumb
+
+    def _load(self, key):
+        path = self.disk.get(key)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        return Thumbnail(data, IMAGE_TYPES[os.path.splitext(path)[1]])
+
+    def _store(self, key, data, ext):
+        temp_file = self.disk.temp_path(key) + ext
+        try:
+            with open(temp_file, 'wb') as f:
+                f.write(data)
+            self.disk.commit(key, temp_file)
+        except OSError:
+            # Still serve it; it is just fetched again next time
+            self.disk.discard(temp_file)
+        return Thumbnail(data, IMAGE_TYPES[ext])
+
+    def _build(self, video_id, source_url, width):
+        original = self._load(f'{video_id}-orig') or self._fetch(video_id, source_url)
+        if original is None or not width:
+            return original
+        try:
+            data = _resize(original.data, width, self.quality)
+        except Exception:
+            # Not something Pillow can decode: serve it as it is
+            self.errors += 1
+            return original
+        self.resizes += 1
+        return self._store(f'{video_id}-{width}', data, '.jpg')
+
+    def _fetch(self, video_id, source_url):
+        """Download the original image into the disk tier"""
+        if not source_url:
+            return None
+        if self.session is None:
+            from http_pool import get_session
+            self.session = get_session()
+        try:
+            response = self.session.get(source_url, stream=True, timeout=self.timeout)
+            try:
+                mimetype = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+                if not response.ok or mimetype not in _EXT_BY_TYPE:
+                    self.errors += 1
+                    return None
+                data = response.raw.read(MAX_SOURCE_BYTES + 1, decode_content=True)
+            finally:
+                response.close()
+        except Exception:
+            self.errors += 1
+            return None
+        if len(data) > MAX_SOURCE_BYTES:
+            self.errors += 1
+            return None
+        self.fetches += 1
+        return self._store(f'{video_id}-orig', data, _EXT_BY_TYPE[mimetype])
+
+    def maintain(self):
+        self.disk.maintain()
+
+    def stats(self):
+        return {
+            'resize': PIL_AVAILABLE,
+            'fetches': self.fetches,
+            'resizes': self.resizes,
+            'errors': self.errors,
+            'memory': self.memory.stats(),
+            'disk': self.disk.stats(),
+        }
@@ -0,0 +1,115 @@
+"""
+Bounded pool of warm yt-dlp YoutubeDL instances
+Creating a YoutubeDL (and its extractor registry) is expensive, so instances
+are created once and reused across requests instead of per call
+"""
+import queue
+import threading
+from contextlib import contextmanager
+
+try:
+    import yt_dlp
+    YT_DLP_AVAILABLE = True
+except ImportError:
+    yt_dlp = None
+    YT_DLP_AVAILABLE = False
+
+
+def _default_factory(opts):
+    """Create a YoutubeDL and pre-load the LinkedIn extractor"""
+    ydl = yt_dlp.YoutubeDL(opts)
+    try:
+        ydl.get_info_extractor('LinkedIn')
+    except Exception:
+        pass
+    return ydl
+
+
+class YoutubeDLPool:
+    """
+    Thread-safe pool of YoutubeDL objects that share one set of options.
+    A YoutubeDL instance is not safe to use from two threads at once, so each
+    caller borrows one for the duration of an extraction.
+    """
+
+    def __init__(self, opts, size=4, max_uses=500, factory=None):
+        self.opts = dict(opts)
+        self.size = max(1, size)
+        # Instances accumulate per-run state (cookies, printed messages),
+        # so recycle them after a while
+        self.max_uses = max_uses
+        self._factory = factory or _default_factory
+        self._idle = queue.LifoQueue()  # LIFO keeps the warmest instance busy
+        self._uses = {}
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _create(self):
+        with self._lock:
+            if self._created >= self.size:
+                return None
+            self._created += 1
+        try:
+            ydl = self._factory(self.opts)
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+        self._uses[id(ydl)] = 0
+        return ydl
+
+    def _retire(self, ydl):
+        self._uses.pop(id(ydl), None)
+        with self._lock:
+            self._created -= 1
+        try:
+            ydl.close()
+        except Exception:
+            pass
+        # Threads blocked in acquire() only wake for an idle instance, so
+        # hand them a replacement rather than just freeing the capacity
+        try:
+            replacement = self._create()
+        except Exception:
+            return
+        if replacement is not None:
+            self._idle.put(replacement)
+
+    def warm(self, count=1):
+        """Pre-create up to `count` instances so the first request is fast"""
+        for _ in range(min(count, self.size)):
+            ydl = self._create()
+            if ydl is None:
+                break
+            self._idle.put(ydl)
+
+    @contextmanager
+    def acquire(self, timeout=None):
+        """Borrow an instance, waiting up to `timeout` seconds if all are busy"""
+        try:
+            ydl = self._idle.get_nowait()
+        except queue.Empty:
+            ydl = self._create()
+            if ydl is None:
+                ydl = self._idle.get(timeout=timeout)
+        try:
+            yield ydl
+        finally:
+            uses = self._uses.get(id(ydl), 0) + 1
+            if self.max_uses and uses >= self.max_uses:
+                self._retire(ydl)
+            else:
+                self._uses[id(ydl)] = uses
+                self._idle.put(ydl)
+
+    def extract_info(self, url, timeout=None):
+        """Extract metadata for `url` without downloading"""
+        with self.acquire(timeout) as ydl:
+            return ydl.extract_info(url, download=False)
+
+    def stats(self):
+        return {
+            'size': self.size,
+            'created': self._created,
+            'idle': self._idle.qsize(),
+        }